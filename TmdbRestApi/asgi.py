@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "TmdbRestApi.settings")
 
 application = get_asgi_application()
+
+# Load the in-memory catalog snapshot before serving the first request (if TMDB_SNAPSHOT_ENABLED).
+from tmdbData.snapshot import get_snapshot  # noqa: E402
+
+get_snapshot()
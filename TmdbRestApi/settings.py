@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole request.
+    "tmdbData.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -85,6 +88,58 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Local memory by default; set TMDB_REDIS_URL to share the cache between processes.
+
+if os.environ.get("TMDB_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["TMDB_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "tmdb-api",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+# Seconds a cached read response is kept; responses are also invalidated by dataset version.
+TMDB_RESPONSE_CACHE_TIMEOUT = 600
+
+# Seconds a process reuses the dataset version read from the database; writes and
+# imports made by other processes invalidate its cached data after at most this long.
+TMDB_DATASET_STATE_TTL = 2
+
+# Seconds a failed movie detail lookup is remembered.
+TMDB_NEGATIVE_CACHE_TIMEOUT = 300
+
+# Top-N requests above this many movies are streamed; streams read this many movies per query.
+TMDB_STREAM_THRESHOLD = 1000
+TMDB_STREAM_CHUNK_SIZE = 500
+
+# Maximum number of movie IDs accepted by one batch lookup.
+TMDB_BATCH_MAX_IDS = 500
+
+# Maximum number of movies accepted by one bulk create request.
+TMDB_BULK_CREATE_MAX_MOVIES = 1000
+
+# Maximum number of similar movies returned for one movie.
+TMDB_SIMILAR_MAX_RESULTS = 100
+
+# Serve listings and top-N results from an in-memory snapshot of the catalog,
+# reloaded whenever the dataset version changes.
+TMDB_SNAPSHOT_ENABLED = False
+
+# Seconds a verified API token is cached in process memory, and how many are kept.
+TMDB_AUTH_CACHE_TTL = 300
+TMDB_AUTH_CACHE_SIZE = 10000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -128,12 +183,15 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 REST_FRAMEWORK = {
+    # Token authentication with an in-process cache of verified tokens is the
+    # cheap path; Basic authentication (a password hash per request) still works.
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.BasicAuthentication',
+        'tmdbData.authentication.CachedTokenAuthentication',
+        'tmdbData.authentication.TimedBasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'tmdbData.pagination.KeysetPagination',
     'PAGE_SIZE': 10  
 }
\ No newline at end of file
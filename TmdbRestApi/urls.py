@@ -15,27 +15,45 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
-from tmdbData.views import (MovieDetailView, MovieCreateView, MoviesByActorView, MoviesByGenreView,  
-                            MoviesByDirectorView, TopRatedMoviesView, BestROIView)
+from django.urls import path, register_converter
+from tmdbData.views import (MovieDetailView, MovieBatchView, MovieCreateView, MovieBulkCreateView, MoviesByActorView, MoviesByGenreView,  
+                            MoviesByDirectorView, MovieSearchView, TopRatedMoviesView, BestROIView, MovieExportView,
+                            CacheStatsView, MetricsView, SimilarMoviesView)
 from django.conf.urls.static import static
 from django.conf import settings
+from rest_framework.authtoken.views import obtain_auth_token
+from tmdbData.converters import MovieIdConverter
+
+# Movie IDs in URLs may be TMDB IDs or IMDb IDs.
+register_converter(MovieIdConverter, 'movie_id')
 
 urlpatterns = [
     # Admin site URL. Provides the interface for site administrators.
     path("admin/", admin.site.urls),
 
-    # URL pattern for movie detail view. 
-    path('movies/<int:id>/', MovieDetailView.as_view(), name='movie-detail'),
+    # URL pattern for movie detail view, by TMDB ID or IMDb ID.
+    path('movies/<movie_id:id>/', MovieDetailView.as_view(), name='movie-detail'),
     
+    # URL pattern resolving many movie IDs in one request.
+    path('movies/batch/', MovieBatchView.as_view(), name='movie-batch'),
+
+    # URL pattern for the movies most similar to a movie (TMDB or IMDb ID).
+    path('movies/<movie_id:id>/similar/', SimilarMoviesView.as_view(), name='similar-movies'),
+
     path('movies/create/', MovieCreateView.as_view(), name='create-movie'),
 
+    # URL pattern creating many movies from a JSON array in one request.
+    path('movies/bulk-create/', MovieBulkCreateView.as_view(), name='bulk-create-movies'),
+
     # URL pattern for movies by actor view. 
     path('movies/actor/<str:actor_name>/', MoviesByActorView.as_view(), name='movies-by-actor'),
 
     # URL pattern for movies by genre view. 
     path('movies/genre/<str:genre_name>/', MoviesByGenreView.as_view(), name='movies-by-genre'),
 
+    # URL pattern combining the genre, actor, director and numeric filters with a chosen sort.
+    path('movies/search/', MovieSearchView.as_view(), name='movie-search'),
+
     # URL pattern for top-rated movies view. 
     path('movies/top-rated/<int:top_n>/', TopRatedMoviesView.as_view(), name='top-rated-movies'),
 
@@ -45,6 +63,18 @@ urlpatterns = [
     # URL pattern for movies by director view. 
     path('movies/director/<str:director_name>/', MoviesByDirectorView.as_view(), name='movies-by-director'),
 
+    # URL pattern streaming the full catalog as NDJSON (or a JSON array with ?stream=json).
+    path('movies/export/', MovieExportView.as_view(), name='movie-export'),
+
+    # URL pattern exchanging a username and password for an API token.
+    path('auth/token/', obtain_auth_token, name='auth-token'),
+
+    # URL pattern for the response cache statistics (admin users only).
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+
+    # URL pattern for the request timing metrics, in the Prometheus text format.
+    path('metrics', MetricsView.as_view(), name='metrics'),
+
     # Static files URL pattern. Used during development to serve static files.
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 # Static files URL pattern. Used during development to serve static files.
\ No newline at end of file
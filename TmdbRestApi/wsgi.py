@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "TmdbRestApi.settings")
 
 application = get_wsgi_application()
+
+# Load the in-memory catalog snapshot before serving the first request (if TMDB_SNAPSHOT_ENABLED).
+from tmdbData.snapshot import get_snapshot  # noqa: E402
+
+get_snapshot()
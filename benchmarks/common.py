@@ -0,0 +1,57 @@
+import contextlib
+import os
+import sys
+import tempfile
+
+# Shared setup of the benchmark scripts: Django configured from the project
+# settings and a throwaway test database filled with a synthetic catalog.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TmdbRestApi.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from tmdbData.models import Actor, Director, Genre, IMDBEntry, Movies
+
+
+# Run the enclosed block against a throwaway test database. SQLite test databases
+# are files, as in a deployment: the default in-memory one outlives
+# destroy_test_db, and would carry one block's catalog into the next. Whatever
+# was set up is undone, in reverse order, even when a later step fails.
+@contextlib.contextmanager
+def test_database():
+    with contextlib.ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory(prefix='tmdb-benchmark-db-'))
+        if connection.vendor == 'sqlite':
+            test_settings = connection.settings_dict['TEST']
+            stack.callback(test_settings.__setitem__, 'NAME', test_settings.get('NAME'))
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        setup_test_environment()
+        stack.callback(teardown_test_environment)
+        old_name = connection.creation.create_test_db(verbosity=0)
+        stack.callback(connection.creation.destroy_test_db, old_name, verbosity=0, keepdb=False)
+        yield
+
+# Create movies with three genres, three casts and one director each.
+def create_catalog(count):
+    genres = Genre.objects.bulk_create(Genre(genre_id=n, name=f'Genre {n}', slug=f'genre-{n}') for n in range(20))
+    directors = Director.objects.bulk_create(
+        Director(director_id=f'nm{n:07d}', name=f'Director {n}', slug=f'director-{n}') for n in range(max(count // 10, 1)))
+    actors = Actor.objects.bulk_create(Actor(name=f'Actor {n}', slug=f'actor-{n}') for n in range(count))
+    IMDBEntry.objects.bulk_create(IMDBEntry(imdb_id=f'tt{n:07d}') for n in range(1, count + 1))
+    Movies.objects.bulk_create(
+        Movies(tmdb_id=n, title=f'Movie {n}', imdb_id_id=f'tt{n:07d}', vote_average=n % 100 / 10, vote_count=n,
+               release_date='2000-01-01', runtime=100, adult=False, revenue=n * 1000, budget=500,
+               overview='Overview ' * 20, roi=n * 2.0)
+        for n in range(1, count + 1))
+    Movies.genres.through.objects.bulk_create(
+        Movies.genres.through(movies_id=n, genre_id=genres[(n + k) % len(genres)].pk)
+        for n in range(1, count + 1) for k in range(3))
+    Movies.casts.through.objects.bulk_create(
+        Movies.casts.through(movies_id=n, actor_id=actors[(n + k) % len(actors)].pk)
+        for n in range(1, count + 1) for k in range(3))
+    Movies.directors.through.objects.bulk_create(
+        Movies.directors.through(movies_id=n, director_id=directors[n % len(directors)].pk)
+        for n in range(1, count + 1))
@@ -0,0 +1,56 @@
+import argparse
+import json
+import sys
+
+# Compares two result files of benchmarks/suite.py, e.g. from the parent commit
+# and from a change, and exits with 1 if the change regressed:
+#     python benchmarks/compare.py base.json change.json [--threshold 1.25]
+# A route regresses when its p50 or p99 latency grows by more than the threshold
+# factor, or when it runs more queries per request; the import regresses when its
+# throughput drops by more than the threshold factor.
+
+# Latencies below this many milliseconds are too noisy to compare.
+MIN_LATENCY_MS = 1.0
+
+
+def load(path):
+    with open(path) as results:
+        return {size['size']: size for size in json.load(results)['sizes']}
+
+# Regression messages of one catalog size.
+def regressions(size, base, change, threshold):
+    found = []
+    base_rate, change_rate = base['import']['movies_per_second'], change['import']['movies_per_second']
+    if change_rate * threshold < base_rate:
+        found.append(f'{size} movies: import {base_rate:,.0f} -> {change_rate:,.0f} movies/s')
+    for route, modes in change['routes'].items():
+        for mode, stats in modes.items():
+            before = base['routes'].get(route, {}).get(mode)
+            if before is None:
+                continue
+            for metric in ('p50_ms', 'p99_ms'):
+                if stats[metric] > max(before[metric], MIN_LATENCY_MS) * threshold:
+                    found.append(f'{size} movies: {route} ({mode}) {metric} {before[metric]:.2f} -> {stats[metric]:.2f}')
+            if stats['queries'] > before['queries']:
+                found.append(f'{size} movies: {route} ({mode}) queries {before["queries"]:g} -> {stats["queries"]:g}')
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('base')
+    parser.add_argument('change')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Slowdown factor reported as a regression (default: 1.25).')
+    args = parser.parse_args(argv)
+    base, change = load(args.base), load(args.change)
+    found = []
+    for size in sorted(base.keys() & change.keys()):
+        found.extend(regressions(size, base[size], change[size], args.threshold))
+    for message in found:
+        print(message)
+    if not found:
+        print('No regressions.')
+    return 1 if found else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import sys
+import time
+
+# Compares MovieSerializer with the lean read path (tmdbData.representations) on
+# the same ranked list of movies, in a throwaway test database:
+#     python benchmarks/serialization.py [movies] [repeats]
+from common import create_catalog, test_database
+from tmdbData.models import Movies
+from tmdbData.representations import movie_values, represent_movies
+from tmdbData.serializers import MovieSerializer, rank_map
+
+# Required speedup of the lean path over MovieSerializer.
+TARGET_SPEEDUP = 5
+
+
+def serializer_path(count):
+    movies = list(Movies.objects.with_relations().order_by('-vote_average', 'tmdb_id')[:count])
+    return MovieSerializer(movies, many=True, context={'ranks': rank_map(movies)}).data
+
+def lean_path(count):
+    return represent_movies(movie_values(Movies.objects.order_by('-vote_average', 'tmdb_id'))[:count], start_rank=1)
+
+# Best wall time of a few runs, in seconds.
+def best_time(func, count, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(count)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(count=1000, repeats=5):
+    with test_database():
+        create_catalog(count)
+        if serializer_path(count) != lean_path(count):
+            print('Lean output differs from MovieSerializer output.')
+            return 1
+        serializer_seconds = best_time(serializer_path, count, repeats)
+        lean_seconds = best_time(lean_path, count, repeats)
+    speedup = serializer_seconds / lean_seconds
+    print(f'{count} movies: MovieSerializer {serializer_seconds * 1000:.1f} ms, '
+          f'lean {lean_seconds * 1000:.1f} ms, {speedup:.1f}x faster')
+    return 0 if speedup >= TARGET_SPEEDUP else 1
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark suite over synthetic catalogs. For each catalog size it writes a
+# synthetic TMDB dump (benchmarks/synthetic.py), imports it with the same
+# CatalogImporter as populate.py, then requests every route of the URLconf and
+# records p50/p99 latency and queries per request, uncached ("cold", a new
+# dataset version before each request) and from the response cache ("warm").
+# Results are written as JSON, for benchmarks/compare.py to diff two commits:
+#     python benchmarks/suite.py [--sizes 10000 100000 1000000] [--requests 50] [--output results.json]
+from common import test_database
+from synthetic import write_catalog
+import django
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.authtoken.models import Token
+from tmdbData.cache import bump_dataset_version
+from tmdbData.importer import CatalogImporter, DirectorTitle
+from tmdbData.models import Actor, Director, IMDBEntry, Movies
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DEFAULT_REQUESTS = 50
+# Requests per size for routes too slow to repeat on big catalogs.
+SLOW_ROUTE_REQUESTS = {'movie-export': 1, 'auth-token': 5}
+# Movies sent per bulk create request.
+BULK_CREATE_SIZE = 100
+# URL namespaces that are not part of the API.
+SKIPPED_NAMESPACES = ('admin',)
+# Routes that write; they run after the reads, and are only measured uncached.
+WRITE_ROUTES = ('create-movie', 'bulk-create-movies', 'auth-token')
+PASSWORD = 'benchmark'
+
+
+# Names and IDs requests are drawn from, read once the catalog is imported.
+class Catalog:
+    def __init__(self, rng):
+        self.rng = rng
+        self.movie_ids = list(Movies.objects.values_list('tmdb_id', flat=True))
+        self.imdb_ids = list(Movies.objects.values_list('imdb_id', flat=True)[:1000])
+        self.genres = ['drama', 'comedy', 'action', 'thriller', 'western']
+        # Actors and directors of the first movies; the popular ones have the longest listings.
+        self.actors = list(Actor.objects.order_by('pk').values_list('name', flat=True)[:200])
+        self.directors = list(Director.objects.filter(movies__isnull=False).values_list('name', flat=True)[:200])
+        self.next_id = max(self.movie_ids) + 1
+
+    def pick(self, values):
+        return self.rng.choice(values)
+
+    # A new movie as the create endpoints accept it, with an IMDb entry created beforehand.
+    def new_movie(self):
+        tmdb_id = self.next_id
+        self.next_id += 1
+        imdb_id = f'tt9{tmdb_id:08d}'
+        IMDBEntry.objects.create(imdb_id=imdb_id)
+        return {
+            'tmdb_id': tmdb_id, 'title': f'Benchmark Movie {tmdb_id}', 'release_date': '2024-01-01',
+            'vote_average': 7.0, 'vote_count': 100, 'overview': 'Benchmark.', 'runtime': 100, 'adult': False,
+            'revenue': 1000, 'budget': 100, 'imdb_id': imdb_id, 'genres': ['Drama'],
+            'casts': [self.pick(self.actors)], 'directors': [self.pick(self.directors)],
+        }
+
+
+# A sample request for a route: (method, path, data). Routes missing from
+# here are reported as unmeasured, so new routes get added.
+def route_request(name, catalog):
+    pick = catalog.pick
+    if name == 'movie-detail':
+        movie_id = pick(catalog.movie_ids) if catalog.rng.random() < 0.8 else pick(catalog.imdb_ids)
+        return 'get', reverse(name, kwargs={'id': movie_id}), None
+    if name == 'movies-by-actor':
+        return 'get', reverse(name, kwargs={'actor_name': pick(catalog.actors)}), None
+    if name == 'movies-by-genre':
+        return 'get', reverse(name, kwargs={'genre_name': pick(catalog.genres)}), None
+    if name == 'movies-by-director':
+        return 'get', reverse(name, kwargs={'director_name': pick(catalog.directors)}), None
+    if name == 'similar-movies':
+        return 'get', reverse(name, kwargs={'id': pick(catalog.movie_ids)}), {'k': 10}
+    if name == 'movie-batch':
+        ids = catalog.rng.sample(catalog.movie_ids, min(50, len(catalog.movie_ids)))
+        return 'get', reverse(name), {'ids': ','.join(map(str, ids))}
+    if name == 'movie-search':
+        return 'get', reverse(name), {'genre': pick(catalog.genres), 'year_from': catalog.rng.randint(1950, 2010),
+                                      'min_votes': 50, 'sort': pick(('-vote_average', '-roi', '-release_date'))}
+    if name in ('top-rated-movies', 'best-roi-movies'):
+        return 'get', reverse(name, kwargs={'top_n': pick((10, 100, 500))}), None
+    if name == 'movie-export':
+        return 'get', reverse(name), None
+    if name in ('cache-stats', 'metrics'):
+        return 'get', reverse(name), None
+    if name == 'create-movie':
+        return 'post', reverse(name), catalog.new_movie()
+    if name == 'bulk-create-movies':
+        return 'post', reverse(name), [catalog.new_movie() for _ in range(BULK_CREATE_SIZE)]
+    if name == 'auth-token':
+        return 'post', reverse(name), {'username': 'benchmark', 'password': PASSWORD}
+    return None
+
+# Names of the API's URL patterns, in URLconf order.
+def route_names(patterns=None):
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace not in SKIPPED_NAMESPACES:
+                yield from route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+# Nearest-rank percentile of a list of numbers.
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+# Send requests to one route and summarize their latency (ms) and query counts.
+def measure(client, name, catalog, requests, cold):
+    latencies, queries = [], []
+    for _ in range(requests):
+        method, path, data = route_request(name, catalog)
+        if cold:
+            bump_dataset_version()
+        kwargs = {'content_type': 'application/json'} if method == 'post' else {}
+        # The query log is capped, and counts taken from a full log are wrong.
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data, **kwargs)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}')
+        queries.append(len(captured))
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+    }
+
+# Import a synthetic catalog of count movies and report the importer's throughput.
+def import_catalog(count, workers, seed):
+    data_dir = tempfile.mkdtemp(prefix='tmdb-benchmark-')
+    try:
+        write_catalog(data_dir, count, seed)
+        started = time.perf_counter()
+        stats = CatalogImporter(data_dir, workers=workers, progress=False).run()
+        seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(data_dir)
+    # The importer records directors' known-for titles but does not credit them on
+    # the movies; link them here so the director routes have listings to serve.
+    Movies.directors.through.objects.bulk_create(
+        (Movies.directors.through(movies_id=tmdb_id, director_id=director_id) for director_id, tmdb_id in
+         DirectorTitle.objects.filter(imdbentry__movies__isnull=False).values_list('director_id', 'imdbentry__movies')),
+        batch_size=1000)
+    bump_dataset_version()
+    movies = Movies.objects.count()
+    return {
+        'movies': movies,
+        'seconds': round(seconds, 3),
+        'movies_per_second': round(movies / seconds, 1),
+        'stages': [{'name': stage.name, 'rows': stage.rows, 'seconds': round(stage.seconds, 3),
+                    'rows_per_second': round(stage.rows_per_second, 1), 'queries': stage.queries}
+                   for stage in stats],
+    }
+
+def run_size(count, requests, workers, seed):
+    with test_database():
+        result = {'size': count, 'import': import_catalog(count, workers, seed)}
+        user = User.objects.create_superuser('benchmark', password=PASSWORD)
+        client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        catalog = Catalog(random.Random(seed))
+        names = list(route_names())
+        routes, unmeasured = {}, []
+        for name in sorted(names, key=lambda name: name in WRITE_ROUTES):
+            if route_request(name, catalog) is None:
+                unmeasured.append(name)
+                continue
+            count_requests = min(requests, SLOW_ROUTE_REQUESTS.get(name, requests))
+            routes[name] = {'cold': measure(client, name, catalog, count_requests, cold=True)}
+            if name not in WRITE_ROUTES:
+                routes[name]['warm'] = measure(client, name, catalog, count_requests, cold=False)
+            print(f'  {name}: p50 {routes[name]["cold"]["p50_ms"]:.1f} ms cold, '
+                  f'{routes[name]["cold"]["queries"]:g} queries', flush=True)
+        result['routes'] = routes
+        result['unmeasured_routes'] = unmeasured
+    return result
+
+# Commit the results belong to, or None outside a git checkout.
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark import and every API route on synthetic catalogs.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Catalog sizes, in movies.')
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Requests per route and mode.')
+    parser.add_argument('--workers', type=int, default=1, help='Importer parsing processes.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the catalogs and requests.')
+    parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results.')
+    args = parser.parse_args(argv)
+    results = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'requests': args.requests,
+        'seed': args.seed,
+        'sizes': [],
+    }
+    for count in args.sizes:
+        print(f'{count} movies:', flush=True)
+        result = run_size(count, args.requests, args.workers, args.seed)
+        print(f'  import: {result["import"]["seconds"]:.1f} s, {result["import"]["movies_per_second"]:,.0f} movies/s')
+        if result['unmeasured_routes']:
+            print(f'  not measured (no sample request): {", ".join(result["unmeasured_routes"])}')
+        results['sizes'].append(result)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'Results written to {args.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import csv
+import datetime
+import os
+import random
+import sys
+
+# Writes a synthetic TMDB dump in the layout CatalogImporter (python manage.py
+# import_tmdb, populate.py) reads, so large catalogs go through the real loader:
+#     python benchmarks/synthetic.py <movies> <directory> [seed]
+# The same size and seed always produce the same files.
+
+# TMDB genre ids and names, with how often each is given to a movie.
+GENRES = [
+    (28, 'Action', 14), (12, 'Adventure', 8), (16, 'Animation', 4), (35, 'Comedy', 16), (80, 'Crime', 7),
+    (99, 'Documentary', 3), (18, 'Drama', 24), (10751, 'Family', 5), (14, 'Fantasy', 5), (36, 'History', 2),
+    (27, 'Horror', 7), (10402, 'Music', 2), (9648, 'Mystery', 4), (10749, 'Romance', 8),
+    (878, 'Science Fiction', 5), (10770, 'TV Movie', 2), (53, 'Thriller', 11), (10752, 'War', 2), (37, 'Western', 1),
+]
+# Actors and directors in the pool per movie.
+ACTORS_PER_MOVIE = 1.5
+DIRECTORS_PER_MOVIE = 0.25
+# Range of credited actors per movie in the casts CSV; the importer keeps the first three.
+CAST_SIZE = (4, 15)
+# Most IMDb titles listed as known-for per director, as in the IMDb dump.
+KNOWN_FOR_TITLES = 4
+# Share of movies without an IMDb ID, which the importer skips.
+MISSING_IMDB_RATE = 0.01
+
+MOVIES_CSV = 'tmdb_9999_popular_movies_database.csv'
+DIRECTORS_CSV = 'directors_to_imdb_id.csv'
+GENRES_CSV = 'genres_id.csv'
+CASTS_CSV = 'tmdb_id_to_casts.csv'
+MOVIE_GENRES_CSV = 'tmdb_id_to_genres.csv'
+
+
+# Index into a pool of the given size, skewed so a few entries (star actors,
+# prolific directors) are picked far more often than the long tail.
+def popular(rng, size):
+    return min(int(size * rng.random() ** 3), size - 1)
+
+def imdb_id(tmdb_id):
+    return f'tt{tmdb_id:08d}'
+
+def movie_row(rng, tmdb_id):
+    budget = 0 if rng.random() < 0.3 else int(rng.lognormvariate(16, 1.2))
+    revenue = 0 if rng.random() < 0.35 else int((budget or 10 ** 6) * rng.lognormvariate(0.5, 1))
+    released = datetime.date(1920, 1, 1) + datetime.timedelta(days=rng.randrange(105 * 365))
+    return [
+        tmdb_id,
+        f'Synthetic Movie {tmdb_id}',
+        '' if rng.random() < MISSING_IMDB_RATE else imdb_id(tmdb_id),
+        f'{min(max(rng.gauss(6.4, 1.1), 0), 10):.3f}',
+        min(int(rng.paretovariate(1.2) * 20), 40000),
+        'en',
+        released.strftime('%Y/%m/%d'),
+        max(int(rng.gauss(105, 22)), 1),
+        'True' if rng.random() < 0.01 else 'False',
+        revenue,
+        budget,
+        '', '', '',
+        f'Overview of synthetic movie {tmdb_id}. ' * 4,
+    ]
+
+# Write the five CSV files of a catalog of count movies into directory.
+def write_catalog(directory, count, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    actors = max(int(count * ACTORS_PER_MOVIE), 1)
+    directors = max(int(count * DIRECTORS_PER_MOVIE), 1)
+    genre_ids = [genre_id for genre_id, _, _ in GENRES]
+    genre_weights = [weight for _, _, weight in GENRES]
+    known_for = [[] for _ in range(directors)]
+
+    def writer(name, header):
+        handle = open(os.path.join(directory, name), 'w', newline='')
+        files.append(handle)
+        rows = csv.writer(handle)
+        rows.writerow(header)
+        return rows
+
+    files = []
+    try:
+        writer(GENRES_CSV, ['genre_id', 'name']).writerows((genre_id, name) for genre_id, name, _ in GENRES)
+        movies = writer(MOVIES_CSV, ['id'] * 15)
+        casts = writer(CASTS_CSV, ['tmdb_id', 'casts'])
+        movie_genres = writer(MOVIE_GENRES_CSV, ['tmdb_id', 'genre_ids'])
+        for tmdb_id in range(1, count + 1):
+            movies.writerow(movie_row(rng, tmdb_id))
+            cast = {popular(rng, actors) for _ in range(rng.randint(*CAST_SIZE))}
+            casts.writerow([tmdb_id, ','.join(f'Actor {n}' for n in sorted(cast))])
+            genres = set(rng.choices(genre_ids, genre_weights, k=rng.choice((1, 2, 2, 3, 3, 4))))
+            movie_genres.writerow([tmdb_id, ','.join(map(str, sorted(genres)))])
+            titles = known_for[popular(rng, directors)]
+            if len(titles) < KNOWN_FOR_TITLES:
+                titles.append(imdb_id(tmdb_id))
+        directors_csv = writer(DIRECTORS_CSV, ['director_id', 'name', 'birthYear', 'deathYear',
+                                               'primaryProfession', 'knownForTitles'])
+        for n, titles in enumerate(known_for):
+            directors_csv.writerow([f'nm{n:08d}', f'Director {n}', rng.randint(1900, 1995), '\\N',
+                                    'director', ','.join(titles)])
+    finally:
+        for handle in files:
+            handle.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit('usage: python benchmarks/synthetic.py <movies> <directory> [seed]')
+    write_catalog(sys.argv[2], int(sys.argv[1]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
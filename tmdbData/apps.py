@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TmdbdataConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tmdbData"
+
+    def ready(self):
+        # Connect the model signal handlers and the per-request query timer.
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+from .metrics import timed
+
+# Seconds a verified token stays cached; bounds staleness across processes.
+AUTH_CACHE_TTL = getattr(settings, 'TMDB_AUTH_CACHE_TTL', 300)
+# Maximum number of verified tokens kept per process.
+AUTH_CACHE_SIZE = getattr(settings, 'TMDB_AUTH_CACHE_SIZE', 10000)
+
+
+# In-process LRU cache of verified tokens: key -> (user, token, expiry).
+class VerifiedTokenCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (user, token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # Drop one token, e.g. after it is deleted.
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Drop every token of a user, e.g. after the user is deactivated.
+    def evict_user(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0].pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(AUTH_CACHE_TTL, AUTH_CACHE_SIZE)
+
+
+# Token authentication that remembers verified tokens in process memory, so an
+# authenticated request costs a dictionary lookup instead of a database query
+# (or, with BasicAuthentication, a password hash).
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cached = verified_tokens.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        verified_tokens.set(key, user, token)
+        return user, token
+
+
+# Basic authentication whose cost (mostly password hashing) is timed per request.
+class TimedBasicAuthentication(BasicAuthentication):
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
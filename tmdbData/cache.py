@@ -0,0 +1,161 @@
+import functools
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.response import Response
+from .models import DatasetState
+
+# How long a failed movie lookup is remembered, in seconds.
+NEGATIVE_CACHE_TIMEOUT = getattr(settings, 'TMDB_NEGATIVE_CACHE_TIMEOUT', 300)
+# How long a rendered read response is kept, in seconds.
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'TMDB_RESPONSE_CACHE_TIMEOUT', 600)
+
+# Seconds a process keeps the dataset state it read from the database; bumps made
+# by other processes (imports, other workers) are seen after at most this long.
+DATASET_STATE_TTL = getattr(settings, 'TMDB_DATASET_STATE_TTL', 2)
+
+# Cache key holding the (version, last modified time) of the dataset.
+DATASET_STATE_KEY = 'tmdb:dataset-state'
+# Primary key of the single DatasetState row.
+DATASET_STATE_ID = 1
+
+# Per-process response cache hit/miss counters.
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+
+# (version, last modified time in epoch seconds) stored in the database, creating
+# the state row if it is missing.
+def load_dataset_state():
+    state, _ = DatasetState.objects.get_or_create(
+        pk=DATASET_STATE_ID, defaults={'version': time.time_ns(), 'modified': timezone.now()})
+    return state.version, int(state.modified.timestamp())
+
+# (version, last modified time) of the dataset. Every cached entry is keyed on the
+# version, so bumping it invalidates all of them at once. The state is stored in
+# the database, shared by every process, and read through the cache.
+def get_dataset_state():
+    state = cache.get(DATASET_STATE_KEY)
+    if state is None:
+        state = load_dataset_state()
+        cache.set(DATASET_STATE_KEY, state, DATASET_STATE_TTL)
+    return state
+
+# Current dataset version.
+def get_dataset_version():
+    return get_dataset_state()[0]
+
+# Drop this process's copy of the dataset state, so the next read sees the database's.
+def forget_dataset_state():
+    cache.delete(DATASET_STATE_KEY)
+
+# Move to a new dataset version after movies are written or bulk loaded. Versions
+# only grow, and start from the current time so a rolled back bump can't bring a
+# version cached entries were keyed on back. Inside a transaction, other
+# processes see the new version once it commits, so the cached state is dropped
+# again then.
+def bump_dataset_version():
+    now = timezone.now()
+    updated = DatasetState.objects.filter(pk=DATASET_STATE_ID).update(
+        version=Greatest(F('version') + 1, Value(time.time_ns())), modified=now)
+    if not updated:
+        DatasetState.objects.get_or_create(pk=DATASET_STATE_ID, defaults={'version': time.time_ns(), 'modified': now})
+    forget_dataset_state()
+    transaction.on_commit(forget_dataset_state)
+
+# Cache key for a movie ID (TMDB or IMDb) known not to exist in this dataset version.
+def movie_miss_key(movie_id):
+    return f'tmdb:movie-miss:{get_dataset_version()}:{movie_id}'
+
+# Whether a previous lookup of this movie ID found nothing.
+def is_known_missing(movie_id):
+    return cache.get(movie_miss_key(movie_id)) is not None
+
+# Remember that no movie exists for this ID, so repeated probes skip the database.
+def remember_missing(movie_id):
+    cache.set(movie_miss_key(movie_id), True, NEGATIVE_CACHE_TIMEOUT)
+
+# Cache key for a read request: dataset version, path and sorted query parameters.
+def response_cache_key(request, version):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'tmdb:response:{version}:{digest}'
+
+# Strong ETag of a read response: it changes with the dataset version, and the
+# path, query and Accept header pick the representation.
+def response_etag(request, version):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    accept = request.headers.get('Accept', '')
+    digest = hashlib.md5(f'{request.path}?{query}\n{accept}'.encode()).hexdigest()
+    return f'"{version}-{digest[:16]}"'
+
+# 304 (or 412) response for a conditional request whose condition is met by the
+# current dataset, or None when the full response is needed.
+def conditional_response(request, etag, modified):
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is not None:
+        _record('not_modified')
+        add_validators(response, etag, modified)
+    return response
+
+# Add the validators clients send back in If-None-Match / If-Modified-Since.
+def add_validators(response, etag, modified):
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(modified)
+    patch_vary_headers(response, ('Accept',))
+
+# Count a response cache hit or miss.
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+# Snapshot of the response cache counters for this process.
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    stats['dataset_version'] = get_dataset_version()
+    return stats
+
+# Reset the response cache counters.
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0, not_modified=0)
+
+# Decorator for read handlers (get/list) of API views: successful response data
+# is cached per request path and query, and served from the cache until the
+# dataset version changes. Responses carry an ETag and Last-Modified derived from
+# the dataset version, and a client already holding the current data gets a 304
+# before the handler (and any query or serialization) runs.
+def cache_response(handler):
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        version, modified = get_dataset_state()
+        etag = response_etag(request, version)
+        not_modified = conditional_response(request, etag, modified)
+        if not_modified is not None:
+            return not_modified
+        key = response_cache_key(request, version)
+        data = cache.get(key)
+        if data is not None:
+            _record('hits')
+            response = Response(data)
+        else:
+            _record('misses')
+            response = handler(self, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        if response.status_code == 200:
+            add_validators(response, etag, modified)
+        return response
+    return wrapper
@@ -0,0 +1,21 @@
+import re
+
+# URL converter matching either a TMDB ID ('603') or an IMDb ID ('tt0133093').
+class MovieIdConverter:
+    regex = r'tt\d+|\d+'
+
+    # IMDb IDs stay strings, TMDB IDs become integers.
+    def to_python(self, value):
+        if value.startswith('tt'):
+            return value
+        return int(value)
+
+    def to_url(self, value):
+        return str(value)
+
+
+# Parse a movie ID from a query parameter the way MovieIdConverter does; None if it is not one.
+def parse_movie_id(value):
+    if re.fullmatch(MovieIdConverter.regex, value) is None:
+        return None
+    return MovieIdConverter().to_python(value)
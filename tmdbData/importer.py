@@ -0,0 +1,437 @@
+import csv
+import datetime
+import functools
+import hashlib
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+import django
+from django.db import connection, transaction
+from tqdm import tqdm
+from .cache import bump_dataset_version
+from .leaderboards import rebuild_leaderboards
+from .models import Actor, Director, Genre, IMDBEntry, ImportCheckpoint, ImportFingerprint, Movies, name_slug
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# CSV files of a TMDB dump, looked up in the importer's data directory.
+MOVIES_CSV = 'tmdb_9999_popular_movies_database.csv'
+DIRECTORS_CSV = 'directors_to_imdb_id.csv'
+GENRES_CSV = 'genres_id.csv'
+CASTS_CSV = 'tmdb_id_to_casts.csv'
+MOVIE_GENRES_CSV = 'tmdb_id_to_genres.csv'
+
+# Only the first few billed actors of each movie are linked.
+CASTS_PER_MOVIE = 3
+# Release date used when the CSV has none or an unparseable one.
+DEFAULT_RELEASE_DATE = '1900-01-01'
+
+# Through models of the many-to-many relations written by the importer.
+MovieCast = Movies.casts.through
+MovieGenre = Movies.genres.through
+DirectorTitle = Director.known_for_titles.through
+
+# Movie columns overwritten when an imported movie already exists.
+MOVIE_UPDATE_FIELDS = ['title', 'imdb_id', 'vote_average', 'vote_count', 'release_date', 'runtime',
+                       'adult', 'revenue', 'budget', 'overview', 'roi']
+
+
+# Timing and resource usage of one import stage.
+@dataclass
+class StageStats:
+    name: str
+    rows: int = 0
+    changed: int = 0
+    seconds: float = 0.0
+    queries: int = 0
+    peak_memory_mb: float = None
+    # whether the stage was already completed by an earlier, interrupted run
+    resumed: bool = False
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        if self.resumed:
+            return f"{self.name}: {self.rows} rows ({self.changed} changed), completed by a previous run"
+        memory = f", peak memory {self.peak_memory_mb:.0f} MB" if self.peak_memory_mb is not None else ''
+        return (f"{self.name}: {self.rows} rows ({self.changed} changed) in {self.seconds:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/s), {self.queries} queries{memory}")
+
+
+# Peak resident memory of this process in MB, or None where it can't be measured.
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Database execute wrapper counting the queries run through a connection.
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# Row parsers. They run in worker processes, so they only build plain tuples
+# and dicts; every record starts with the row's key and fingerprint.
+
+# Convert a 'YYYY/MM/DD' CSV date into 'YYYY-MM-DD', falling back to the default date.
+def parse_release_date(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y/%m/%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return DEFAULT_RELEASE_DATE
+
+# Split a quoted, comma-separated CSV cell into its stripped, non-empty items.
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+# Hash of a CSV row, stored to detect changed rows on the next delta import.
+def row_digest(row):
+    return hashlib.sha1('\x1f'.join(row).encode()).hexdigest()
+
+# Genre field values for a genres CSV row, or None for rows without an id.
+def parse_genre_row(row):
+    if not row[0].strip():
+        return None
+    name = row[1].strip()
+    return {'genre_id': int(row[0]), 'name': name, 'slug': name_slug(name)}
+
+# (key, digest, Movies field values) for a movies CSV row, or None if the row has no usable IDs.
+def parse_movie_row(row):
+    # Skipping rows without imdb_id (third column) or with a non-integer tmdb_id.
+    if not row[2]:
+        return None
+    try:
+        tmdb_id = int(row[0])
+    except ValueError:
+        return None
+    revenue = int(row[9]) if row[9] else 0
+    budget = int(row[10]) if row[10] else 0
+    return row[0], row_digest(row), {
+        'tmdb_id': tmdb_id,
+        'title': row[1],
+        'imdb_id_id': row[2],
+        'vote_average': float(row[3]) if row[3] else 0.0,
+        'vote_count': int(row[4]) if row[4] else 0,
+        'release_date': parse_release_date(row[6]),
+        'runtime': int(row[7]) if row[7] else 0,
+        'adult': row[8].lower() == 'true',
+        'revenue': revenue,
+        'budget': budget,
+        'overview': row[14],
+        # bulk_create skips save(), so fill in the stored ROI here.
+        'roi': Movies.compute_roi(revenue, budget),
+    }
+
+# (key, digest, tmdb_id, top-billed actor names) for a casts CSV row.
+def parse_cast_row(row):
+    return row[0], row_digest(row), int(row[0]), split_list(row[1])[:CASTS_PER_MOVIE]
+
+# (key, digest, tmdb_id, genre ids) for a movie genres CSV row.
+def parse_movie_genre_row(row):
+    return row[0], row_digest(row), int(row[0]), [int(genre_id) for genre_id in split_list(row[1])]
+
+# (key, digest, Director field values, known-for IMDb IDs) for a directors CSV row.
+def parse_director_row(row):
+    return row[0], row_digest(row), {
+        'director_id': row[0],
+        'name': row[1],
+        'slug': name_slug(row[1]),
+        # Handle special cases in death_year and birth_year
+        'birth_year': int(row[2]) if row[2] and row[2] != '\\N' else None,
+        'death_year': int(row[3]) if row[3] and row[3] != '\\N' else None,
+        'primary_profession': row[4],
+    }, split_list(row[5])
+
+# Parse a chunk of rows, returning the number of rows read and the usable records.
+def parse_chunk(parser, rows):
+    return len(rows), [record for record in map(parser, rows) if record is not None]
+
+# Yield the data rows of a CSV file in chunks of at most size rows, skipping the header row.
+def read_chunks(path, size):
+    with open(path, newline='') as csv_file:
+        data = csv.reader(csv_file, delimiter=',')
+        next(data, None)
+        chunk = []
+        for row in data:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+# Like executor.map, but with at most limit chunks submitted ahead of the
+# consumer, so a slow writer never lets parsed data pile up in memory.
+def bounded_map(executor, func, iterable, limit):
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Split a list into consecutive chunks of at most size items.
+def chunked(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Streaming CSV loader. Each file is read once in chunks of batch_size rows.
+# With several workers the chunks are parsed in a process pool, and only a
+# bounded number of parsed chunks is kept ahead of the database writer, so
+# memory stays flat however large the dump is.
+#
+# Batches are written with bulk_create, by default all inside one transaction,
+# with lookups (stored movies, actor ids, fingerprints) limited to the keys of that
+# batch. Entity rows are upserted and the links of every processed movie or
+# director are replaced, so loading into a populated database refreshes it.
+#
+# In delta mode each row is compared against the fingerprint stored by the
+# previous import, and only new or changed rows are written.
+#
+# With checkpoint=True every batch is committed in its own transaction together
+# with an ImportCheckpoint recording the stage's progress, and resume=True
+# continues an interrupted import after its last committed batch.
+class CatalogImporter:
+    def __init__(self, data_dir, batch_size=1000, delta=False, workers=1, progress=True,
+                 checkpoint=False, resume=False):
+        self.data_dir = data_dir
+        self.batch_size = batch_size
+        self.delta = delta
+        self.workers = workers
+        self.progress = progress
+        self.checkpoint = checkpoint or resume
+        self.resume = resume
+        self.stats = []
+        self.executor = None
+        self.checkpoints = {}
+
+    # Run every stage and return their timings.
+    def run(self):
+        self.load_checkpoints()
+        if self.workers > 1:
+            # Workers started with spawn or forkserver import this module afresh, so
+            # Django is set up in each of them before any chunk is unpickled.
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+        try:
+            # Without checkpoints the whole import is a single transaction.
+            with nullcontext() if self.checkpoint else transaction.atomic():
+                self.load_genres()
+                self.load_movies()
+                self.load_casts()
+                self.load_directors()
+                self.load_movie_genres()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        # The import is complete, nothing is left to resume.
+        if self.checkpoint:
+            ImportCheckpoint.objects.all().delete()
+        # Bulk writes skip the incremental leaderboard updates, so re-rank every board
+        # and invalidate cached responses now that the dataset has changed.
+        if any(stats.changed for stats in self.stats):
+            rebuild_leaderboards(self.batch_size)
+            bump_dataset_version()
+        return self.stats
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    # Load the checkpoints to resume from, or clear those of an abandoned import.
+    def load_checkpoints(self):
+        if not self.resume:
+            if self.checkpoint:
+                ImportCheckpoint.objects.all().delete()
+            return
+        self.checkpoints = {checkpoint.stage: checkpoint for checkpoint in ImportCheckpoint.objects.all()}
+        for checkpoint in self.checkpoints.values():
+            if checkpoint.batch_size != self.batch_size:
+                raise ValueError(f"Stage '{checkpoint.stage}' was checkpointed with batch size "
+                                 f"{checkpoint.batch_size}; resume with the same batch size.")
+
+    # Record the progress of a stage (no-op without checkpoints).
+    def save_checkpoint(self, stats, batches=None, completed=False):
+        if not self.checkpoint:
+            return
+        defaults = {'batch_size': self.batch_size, 'rows': stats.rows, 'changed': stats.changed, 'completed': completed}
+        if batches is not None:
+            defaults['batches'] = batches
+        ImportCheckpoint.objects.update_or_create(stage=stats.name, defaults=defaults)
+
+    # Time a stage and count its queries; the stage function fills in the row counts
+    # of the stats it is given. Stages completed by an interrupted run are skipped.
+    def stage(self, name, func):
+        stats = StageStats(name)
+        checkpoint = self.checkpoints.get(name)
+        if checkpoint is not None:
+            stats.rows, stats.changed = checkpoint.rows, checkpoint.changed
+            if checkpoint.completed:
+                stats.resumed = True
+                self.stats.append(stats)
+                return stats
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            func(stats)
+            self.save_checkpoint(stats, completed=True)
+        stats.seconds = time.perf_counter() - start
+        stats.queries = counter.count
+        stats.peak_memory_mb = peak_memory_mb()
+        self.stats.append(stats)
+        return stats
+
+    # Yield the parsed records of a file batch by batch, counting rows read into stats.
+    # With checkpoints each batch is committed, with its checkpoint, once the caller
+    # has written it, and batches committed by an interrupted run are skipped.
+    def batches(self, filename, parser, stats):
+        checkpoint = self.checkpoints.get(stats.name)
+        skip = checkpoint.batches if checkpoint is not None else 0
+        parse = functools.partial(parse_chunk, parser)
+        chunks = itertools.islice(read_chunks(self.path(filename), self.batch_size), skip, None)
+        if self.executor is None:
+            parsed = map(parse, chunks)
+        else:
+            parsed = bounded_map(self.executor, parse, chunks, self.workers * 2)
+        with tqdm(desc=f"Loading {stats.name}", unit='rows', disable=not self.progress) as progress:
+            for number, (rows, records) in enumerate(parsed, start=skip + 1):
+                stats.rows += rows
+                progress.update(rows)
+                with transaction.atomic() if self.checkpoint else nullcontext():
+                    yield records
+                    self.save_checkpoint(stats, batches=number)
+
+    # Bulk insert objects in batches, ignoring rows that already exist.
+    def write(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch_size, ignore_conflicts=True)
+
+    # Bulk insert objects in batches, overwriting rows that already exist.
+    def upsert(self, model, objs, unique_fields, update_fields):
+        if objs:
+            model.objects.bulk_create(objs, batch_size=self.batch_size, update_conflicts=True,
+                                      unique_fields=unique_fields, update_fields=update_fields)
+
+    # Delete the through rows of the given owners (movies or directors), in batches.
+    def unlink(self, through, owner_field, owner_ids):
+        for chunk in chunked(owner_ids, self.batch_size):
+            through.objects.filter(**{f'{owner_field}__in': chunk}).delete()
+
+    # Drop the records whose fingerprint matches the previous import (delta mode only).
+    def changed(self, source, records):
+        if not self.delta or not records:
+            return records
+        stored = dict(ImportFingerprint.objects.filter(
+            source=source, key__in=[record[0] for record in records]).values_list('key', 'digest'))
+        return [record for record in records if stored.get(record[0]) != record[1]]
+
+    # Store the fingerprints of the records written from a source.
+    def save_fingerprints(self, source, records):
+        self.upsert(ImportFingerprint,
+                    [ImportFingerprint(source=source, key=record[0], digest=record[1]) for record in records],
+                    unique_fields=['source', 'key'], update_fields=['digest'])
+
+    # Keep the link records whose movie (third item) is stored.
+    def for_stored_movies(self, records):
+        if not records:
+            return records
+        stored = set(Movies.objects.filter(
+            tmdb_id__in=[record[2] for record in records]).values_list('tmdb_id', flat=True))
+        return [record for record in records if record[2] in stored]
+
+    # Map actor names to ids, creating the actors not stored yet.
+    def actor_ids(self, names):
+        if not names:
+            return {}
+        actor_ids = dict(Actor.objects.filter(name__in=names).values_list('name', 'id'))
+        new_names = sorted(names - actor_ids.keys())
+        if new_names:
+            self.write(Actor, [Actor(name=name, slug=name_slug(name)) for name in new_names])
+            actor_ids.update(Actor.objects.filter(name__in=new_names).values_list('name', 'id'))
+        return actor_ids
+
+    def load_genres(self):
+        def run(stats):
+            genres = []
+            # The genre list is tiny and upserted in one go, so it is not checkpointed.
+            for rows, records in map(functools.partial(parse_chunk, parse_genre_row),
+                                     read_chunks(self.path(GENRES_CSV), self.batch_size)):
+                stats.rows += rows
+                genres.extend(Genre(**fields) for fields in records)
+            # Only new and renamed genres are written, and count as changed.
+            stored = dict(Genre.objects.values_list('genre_id', 'name'))
+            genres = [genre for genre in genres if stored.get(genre.genre_id) != genre.name]
+            self.upsert(Genre, genres, unique_fields=['genre_id'], update_fields=['name', 'slug'])
+            stats.changed = len(genres)
+        return self.stage('genres', run)
+
+    def load_movies(self):
+        def run(stats):
+            for records in self.batches(MOVIES_CSV, parse_movie_row, stats):
+                records = self.changed('movies', records)
+                self.write(IMDBEntry, [IMDBEntry(imdb_id=fields['imdb_id_id']) for _, _, fields in records])
+                self.upsert(Movies, [Movies(**fields) for _, _, fields in records],
+                            unique_fields=['tmdb_id'], update_fields=MOVIE_UPDATE_FIELDS)
+                self.save_fingerprints('movies', records)
+                stats.changed += len(records)
+        return self.stage('movies', run)
+
+    def load_casts(self):
+        def run(stats):
+            for records in self.batches(CASTS_CSV, parse_cast_row, stats):
+                records = self.for_stored_movies(self.changed('casts', records))
+                actor_ids = self.actor_ids({name for record in records for name in record[3]})
+                # Replace the cast of every changed movie.
+                self.unlink(MovieCast, 'movies_id', [tmdb_id for _, _, tmdb_id, _ in records])
+                self.write(MovieCast, [MovieCast(movies_id=tmdb_id, actor_id=actor_ids[name])
+                                       for _, _, tmdb_id, names in records for name in names])
+                self.save_fingerprints('casts', records)
+                stats.changed += len(records)
+        return self.stage('casts', run)
+
+    def load_directors(self):
+        def run(stats):
+            for records in self.batches(DIRECTORS_CSV, parse_director_row, stats):
+                records = self.changed('directors', records)
+                self.upsert(Director, [Director(**fields) for _, _, fields, _ in records], unique_fields=['director_id'],
+                            update_fields=['name', 'slug', 'birth_year', 'death_year', 'primary_profession'])
+                self.write(IMDBEntry, [IMDBEntry(imdb_id=imdb_id)
+                                       for imdb_id in {imdb_id for record in records for imdb_id in record[3]}])
+                # Replace the known-for titles of every changed director.
+                self.unlink(DirectorTitle, 'director_id', [key for key, _, _, _ in records])
+                self.write(DirectorTitle, [DirectorTitle(director_id=key, imdbentry_id=imdb_id)
+                                           for key, _, _, imdb_ids in records for imdb_id in imdb_ids])
+                self.save_fingerprints('directors', records)
+                stats.changed += len(records)
+        return self.stage('directors', run)
+
+    def load_movie_genres(self):
+        def run(stats):
+            genre_ids = set(Genre.objects.values_list('genre_id', flat=True))
+            for records in self.batches(MOVIE_GENRES_CSV, parse_movie_genre_row, stats):
+                records = self.for_stored_movies(self.changed('movie_genres', records))
+                # Replace the genres of every changed movie.
+                self.unlink(MovieGenre, 'movies_id', [tmdb_id for _, _, tmdb_id, _ in records])
+                self.write(MovieGenre, [MovieGenre(movies_id=tmdb_id, genre_id=genre_id)
+                                        for _, _, tmdb_id, ids in records for genre_id in ids if genre_id in genre_ids])
+                self.save_fingerprints('movie_genres', records)
+                stats.changed += len(records)
+        return self.stage('movie genres', run)
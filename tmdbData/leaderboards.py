@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, When
+from .models import LeaderboardEntry, Movies
+
+# Global leaderboards and their orderings; genre boards rank by vote average.
+TOP_RATED = 'top-rated'
+BEST_ROI = 'best-roi'
+ORDERINGS = {
+    TOP_RATED: ('-vote_average', 'tmdb_id'),
+    BEST_ROI: ('-roi', 'tmdb_id'),
+}
+GENRE_ORDERING = ('-vote_average', 'tmdb_id')
+GENRE_PREFIX = 'genre:'
+
+
+# Name of the leaderboard of the genres with this slug.
+def genre_board(slug):
+    return f'{GENRE_PREFIX}{slug}'
+
+def board_ordering(board):
+    return ORDERINGS.get(board, GENRE_ORDERING)
+
+# Movies ranked on a board.
+def board_movies(board):
+    if board.startswith(GENRE_PREFIX):
+        return Movies.objects.filter(genres__slug=board[len(GENRE_PREFIX):]).distinct()
+    return Movies.objects.all()
+
+# Movies of a board in rank order, annotated with their stored 'rank'; top_n limits it to a prefix.
+def leaderboard_movies(board, top_n=None):
+    # Both conditions go in one filter() call so they apply to the same entry.
+    conditions = {'leaderboard_entries__board': board}
+    if top_n is not None:
+        conditions['leaderboard_entries__rank__lte'] = top_n
+    movies = Movies.objects.filter(**conditions)
+    return movies.annotate(rank=F('leaderboard_entries__rank')).order_by('rank')
+
+# Boards a movie is ranked on: the global ones and one per genre.
+def movie_boards(movie):
+    slugs = movie.genres.values_list('slug', flat=True).distinct()
+    return [TOP_RATED, BEST_ROI, *(genre_board(slug) for slug in slugs)]
+
+# Ranked entries of one board, read in a single ordered query.
+def board_entries(board):
+    tmdb_ids = board_movies(board).order_by(*board_ordering(board)).values_list('tmdb_id', flat=True)
+    return [LeaderboardEntry(board=board, rank=rank, movie_id=tmdb_id) for rank, tmdb_id in enumerate(tmdb_ids, start=1)]
+
+# Recompute one board from scratch.
+def rebuild_board(board, batch_size=1000):
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(board=board).delete()
+        LeaderboardEntry.objects.bulk_create(board_entries(board), batch_size=batch_size)
+
+# Recompute every board, e.g. after a bulk import that bypassed the incremental
+# updates: one query per global board plus one for all genre boards.
+def rebuild_leaderboards(batch_size=1000):
+    entries = board_entries(TOP_RATED) + board_entries(BEST_ROI)
+    genre_movies = (Movies.objects.filter(genres__isnull=False).order_by('genres__slug', *GENRE_ORDERING)
+                    .values_list('genres__slug', 'tmdb_id').distinct())
+    ranks = {}
+    for slug, tmdb_id in genre_movies:
+        board = genre_board(slug)
+        ranks[board] = ranks.get(board, 0) + 1
+        entries.append(LeaderboardEntry(board=board, rank=ranks[board], movie_id=tmdb_id))
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+# Take a movie off some boards (all of them by default), closing the gaps it leaves.
+def remove_movie(movie_id, boards=None):
+    with transaction.atomic():
+        entries = LeaderboardEntry.objects.filter(movie_id=movie_id)
+        if boards is not None:
+            entries = entries.filter(board__in=boards)
+        for board, rank in list(entries.values_list('board', 'rank')):
+            LeaderboardEntry.objects.filter(board=board, rank__gt=rank).update(rank=F('rank') - 1)
+        entries.delete()
+
+# Condition selecting the board entries whose movie ranks before the given movie.
+def ranked_before(movie, ordering):
+    condition = Q()
+    equal = {}
+    for field in ordering:
+        name = field.lstrip('-')
+        lookup = 'gt' if field.startswith('-') else 'lt'
+        value = getattr(movie, name)
+        condition |= Q(**equal, **{f'movie__{name}__{lookup}': value})
+        equal[f'movie__{name}'] = value
+    return condition
+
+# Insert movies not yet on a board at the positions their values rank them,
+# shifting the movies below down, instead of re-sorting the whole board. However
+# many movies are inserted, this is three queries: one counting the entries ranked
+# before each movie, one shifting the entries below and one inserting.
+def insert_movies(board, movies):
+    if not movies:
+        return
+    ordering = board_ordering(board)
+    movies = sorted(movies, key=lambda movie: tuple(
+        -getattr(movie, field[1:]) if field.startswith('-') else getattr(movie, field) for field in ordering))
+    entries = LeaderboardEntry.objects.filter(board=board)
+    counts = entries.aggregate(**{f'before_{position}': Count('pk', filter=ranked_before(movie, ordering))
+                                  for position, movie in enumerate(movies)})
+    # Entries ranked before each movie, in movie order; the list never decreases.
+    before = [counts[f'before_{position}'] for position in range(len(movies))]
+    # An entry moves down by the number of movies inserted before it: the first
+    # matching condition, from the last movie back, gives that number.
+    shifts = {}
+    for position, count in enumerate(before):
+        shifts[count] = position + 1
+    entries.filter(rank__gt=before[0]).update(rank=Case(
+        *(When(rank__gt=count, then=F('rank') + shift) for count, shift in reversed(shifts.items())),
+        default=F('rank')))
+    LeaderboardEntry.objects.bulk_create(
+        LeaderboardEntry(board=board, rank=count + position + 1, movie_id=movie.pk)
+        for position, (movie, count) in enumerate(zip(movies, before)))
+
+# Insert (or move) a movie on boards at the position its values rank it.
+def place_movie(movie, boards):
+    with transaction.atomic():
+        remove_movie(movie.pk, boards)
+        for board in boards:
+            insert_movies(board, [movie])
+
+# Bring a movie's genre boards in line with its current genres.
+def sync_genre_boards(movie):
+    boards = movie_boards(movie)[len(ORDERINGS):]
+    stale = LeaderboardEntry.objects.filter(movie_id=movie.pk, board__startswith=GENRE_PREFIX).exclude(board__in=boards)
+    remove_movie(movie.pk, list(stale.values_list('board', flat=True)))
+    place_movie(movie, boards)
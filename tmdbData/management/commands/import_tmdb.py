@@ -0,0 +1,55 @@
+import os
+import time
+from concurrent.futures import BrokenExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tmdbData.importer import CatalogImporter
+
+
+class Command(BaseCommand):
+    help = "Import a TMDB CSV dump, committing per batch so a failed import can be resumed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('data_dir', nargs='?', default=os.path.join(settings.BASE_DIR, 'csv'),
+                            help="Directory holding the CSV files (default: the project's csv directory).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows parsed and written per batch (default: 1000).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Processes parsing CSV rows (default: one per CPU).")
+        parser.add_argument('--delta', action='store_true',
+                            help="Only write rows that changed since the previous import.")
+        parser.add_argument('--resume', action='store_true',
+                            help="Continue an interrupted import after its last committed batch.")
+        parser.add_argument('--no-progress', action='store_true', help="Hide the progress bars.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+        importer = CatalogImporter(
+            options['data_dir'],
+            batch_size=options['batch_size'],
+            delta=options['delta'],
+            workers=options['workers'],
+            progress=not options['no_progress'],
+            checkpoint=True,
+            resume=options['resume'],
+        )
+        start = time.perf_counter()
+        try:
+            stats = importer.run()
+        # A worker that died takes its batch with it; the committed batches stay.
+        except (BrokenExecutor, OSError, ValueError) as exc:
+            raise CommandError(f"Import failed: {exc}. Re-run with --resume to continue from the last committed batch.")
+        elapsed = time.perf_counter() - start
+
+        # Report each stage, then the totals.
+        for stage in stats:
+            self.stdout.write(str(stage))
+        rows = sum(stage.rows for stage in stats)
+        queries = sum(stage.queries for stage in stats)
+        peaks = [stage.peak_memory_mb for stage in stats if stage.peak_memory_mb is not None]
+        memory = f", peak memory {max(peaks):.0f} MB" if peaks else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s), "
+            f"{queries} queries{memory}."
+        ))
@@ -0,0 +1,147 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from django.db.backends.signals import connection_created
+from rest_framework import renderers
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the per-request query count histogram buckets.
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Timed phases of a request besides its total wall time.
+PHASES = ('db', 'auth', 'serialize')
+
+# Timings of the request being handled in this context, or None outside a request.
+# Context variables follow a request into sync_to_async threads, so phases timed
+# there (e.g. the views of an ASGI deployment) are added to the right request.
+_current = contextvars.ContextVar('tmdb_request_timings', default=None)
+
+
+# Cumulative histogram with fixed buckets, as Prometheus exposes them.
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # (upper bound, cumulative count) pairs, ending with '+Inf'.
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+# Per-process histograms keyed by (metric, view name, phase).
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._queries = {}
+
+    def record(self, view, timings):
+        with self._lock:
+            for phase, seconds in timings.items():
+                if phase == 'queries':
+                    histogram = self._queries.setdefault(view, Histogram(QUERY_BUCKETS))
+                else:
+                    histogram = self._durations.setdefault((view, phase), Histogram(DURATION_BUCKETS))
+                histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._queries.clear()
+
+    # Metrics in the Prometheus text exposition format.
+    def render(self):
+        lines = [
+            '# HELP tmdb_request_duration_seconds Time spent handling requests, by view and phase.',
+            '# TYPE tmdb_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for (view, phase), histogram in sorted(self._durations.items()):
+                lines.extend(histogram_lines('tmdb_request_duration_seconds', f'view="{view}",phase="{phase}"', histogram))
+            lines.extend([
+                '# HELP tmdb_request_queries Database queries run per request, by view.',
+                '# TYPE tmdb_request_queries histogram',
+            ])
+            for view, histogram in sorted(self._queries.items()):
+                lines.extend(histogram_lines('tmdb_request_queries', f'view="{view}"', histogram))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# Exposition lines of one histogram series.
+def histogram_lines(name, labels, histogram):
+    for bound, count in histogram.cumulative():
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+    yield f'{name}_sum{{{labels}}} {histogram.sum}'
+    yield f'{name}_count{{{labels}}} {histogram.count}'
+
+# Start timing a request in the current context; returns its timings.
+def start_request():
+    timings = dict.fromkeys(PHASES, 0.0)
+    timings['queries'] = 0
+    _current.set(timings)
+    return timings
+
+# Stop timing the current request.
+def finish_request():
+    _current.set(None)
+
+# Add elapsed seconds to a phase of the current request, if one is being timed.
+def add_time(phase, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings[phase] += seconds
+
+# Context manager (or decorator) timing a block as a phase of the current request.
+@contextlib.contextmanager
+def timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(phase, time.perf_counter() - start)
+
+# Database execute wrapper counting the queries and their time for the current request.
+def query_timer(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings['db'] += time.perf_counter() - start
+        timings['queries'] += 1
+
+# Install the query timer on every database connection as it is opened, in
+# whichever thread opens it.
+def install_query_timer(sender, connection, **kwargs):
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+connection_created.connect(install_query_timer)
+
+
+# Renderer for the metrics view: the registry's text as is.
+class PrometheusRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data.encode(self.charset) if isinstance(data, str) else data
@@ -0,0 +1,68 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .metrics import finish_request, registry, start_request
+
+# Label of requests that matched no URL pattern.
+UNMATCHED_VIEW = 'unmatched'
+
+
+# Times every request, per view name: wall time, database time and query count,
+# authentication time and serialization (representation and rendering) time.
+# The timings feed the /metrics histograms and are reported to the client in a
+# Server-Timing header. Works in both sync (WSGI) and async (ASGI) stacks; it
+# should be the first middleware, so its wall time covers the others.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request()
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings = start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request()
+        return self.finish(request, response, timings, start)
+
+    # Time the rendering of DRF responses, which happens after the view returns.
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.render_time = time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timings, start):
+        timings['serialize'] += getattr(request, 'render_time', 0.0)
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        registry.record(match.view_name if match and match.view_name else UNMATCHED_VIEW, dict(timings, total=total))
+        response['Server-Timing'] = server_timing(timings, total)
+        return response
+
+
+# Server-Timing header value of a request's timings, in milliseconds.
+def server_timing(timings, total):
+    return ', '.join([
+        f'total;dur={total * 1000:.2f}',
+        f'db;dur={timings["db"] * 1000:.2f};desc="{timings["queries"]} queries"',
+        f'auth;dur={timings["auth"] * 1000:.2f}',
+        f'serialize;dur={timings["serialize"] * 1000:.2f}',
+    ])
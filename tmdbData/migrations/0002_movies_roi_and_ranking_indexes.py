@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-17 20:39
+
+from django.db import migrations, models
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+
+# Fill in the stored ROI for movies loaded before the column existed.
+def backfill_roi(apps, schema_editor):
+    Movies = apps.get_model('tmdbData', 'Movies')
+    Movies.objects.filter(budget__gt=0).update(
+        roi=Cast(F('revenue'), output_field=FloatField()) / F('budget')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movies',
+            name='roi',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.RunPython(backfill_roi, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['-vote_average', 'tmdb_id'], name='movies_vote_avg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['-roi', 'tmdb_id'], name='movies_roi_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.8 on 2026-10-17 20:52
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+# Fill in the normalized name of every actor, director and genre already stored.
+def backfill_slugs(apps, schema_editor):
+    for model_name in ('Actor', 'Director', 'Genre'):
+        model = apps.get_model('tmdbData', model_name)
+        objs = list(model.objects.only('pk', 'name'))
+        for obj in objs:
+            obj.slug = slugify(obj.name.replace('_', ' '), allow_unicode=True)
+        model.objects.bulk_update(objs, ['slug'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0002_movies_roi_and_ranking_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='slug',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='director',
+            name='slug',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='slug',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_slugs, migrations.RunPython.noop),
+    ]
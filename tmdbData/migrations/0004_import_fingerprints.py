@@ -0,0 +1,26 @@
+# Generated by Django 4.2.8 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0003_name_slugs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=100)),
+                ('digest', models.CharField(max_length=40)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importfingerprint',
+            constraint=models.UniqueConstraint(fields=('source', 'key'), name='unique_import_fingerprint'),
+        ),
+    ]
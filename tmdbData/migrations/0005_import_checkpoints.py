@@ -0,0 +1,26 @@
+# Generated by Django 4.2.8 on 2026-10-17 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0004_import_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50, unique=True)),
+                ('batch_size', models.IntegerField()),
+                ('batches', models.IntegerField(default=0)),
+                ('rows', models.IntegerField(default=0)),
+                ('changed', models.IntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
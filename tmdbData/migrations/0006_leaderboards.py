@@ -0,0 +1,43 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Rank the movies already stored on the global and per-genre leaderboards.
+def build_leaderboards(apps, schema_editor):
+    Movies = apps.get_model('tmdbData', 'Movies')
+    Genre = apps.get_model('tmdbData', 'Genre')
+    LeaderboardEntry = apps.get_model('tmdbData', 'LeaderboardEntry')
+    boards = [('top-rated', Movies.objects.order_by('-vote_average', 'tmdb_id')),
+              ('best-roi', Movies.objects.order_by('-roi', 'tmdb_id'))]
+    for slug in Genre.objects.values_list('slug', flat=True).distinct():
+        boards.append((f'genre:{slug}', Movies.objects.filter(genres__slug=slug).distinct().order_by('-vote_average', 'tmdb_id')))
+    for board, movies in boards:
+        LeaderboardEntry.objects.bulk_create(
+            (LeaderboardEntry(board=board, rank=rank, movie_id=tmdb_id)
+             for rank, tmdb_id in enumerate(movies.values_list('tmdb_id', flat=True), start=1)),
+            batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0005_import_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=120)),
+                ('rank', models.IntegerField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='tmdbData.movies')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', 'rank'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.RunPython(build_leaderboards, migrations.RunPython.noop),
+    ]
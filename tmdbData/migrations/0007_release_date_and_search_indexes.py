@@ -0,0 +1,65 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:11
+
+import datetime
+
+from django.db import migrations, models
+
+# Date stored for release dates that cannot be parsed, as the importer does.
+DEFAULT_RELEASE_DATE = '1900-01-01'
+
+
+# Rewrite stored release dates as ISO 'YYYY-MM-DD' text before the column becomes a
+# date: 'YYYY/MM/DD' values are converted and unparseable ones get the default date.
+def normalize_release_dates(apps, schema_editor):
+    Movies = apps.get_model('tmdbData', 'Movies')
+    movies = []
+    for movie in Movies.objects.only('tmdb_id', 'release_date'):
+        value = movie.release_date.strip()
+        for date_format in ('%Y-%m-%d', '%Y/%m/%d'):
+            try:
+                value = datetime.datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+                break
+            except ValueError:
+                pass
+        else:
+            value = DEFAULT_RELEASE_DATE
+        if value != movie.release_date:
+            movie.release_date = value
+            movies.append(movie)
+    Movies.objects.bulk_update(movies, ['release_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0006_leaderboards'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_release_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='movies',
+            name='release_date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['release_date', 'tmdb_id'], name='movies_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['-vote_count', 'tmdb_id'], name='movies_vote_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['runtime', 'tmdb_id'], name='movies_runtime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['adult', '-vote_average', 'tmdb_id'], name='movies_adult_vote_avg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['adult', '-roi', 'tmdb_id'], name='movies_adult_roi_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# Full-text index of movie titles and overviews: an FTS5 table reading its text
+# from tmdbData_movies (external content, keyed by tmdb_id), kept in sync by
+# triggers so bulk imports and API writes alike are indexed. Prefix indexes of
+# 2 and 3 characters make autocomplete queries cheap. SQLite only; other
+# databases, or SQLite builds without FTS5, search with icontains instead.
+#
+# Django rebuilds SQLite tables for some schema changes, which drops their
+# triggers: a later migration that rebuilds tmdbData_movies must re-create them
+# (create_triggers below) and rebuild the index.
+CREATE_TABLE = '''
+    CREATE VIRTUAL TABLE "tmdbData_movies_fts" USING fts5(
+        title, overview,
+        content='tmdbData_movies', content_rowid='tmdb_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+'''
+TRIGGERS = [
+    '''
+    CREATE TRIGGER "tmdbData_movies_fts_insert" AFTER INSERT ON "tmdbData_movies" BEGIN
+        INSERT INTO "tmdbData_movies_fts" (rowid, title, overview) VALUES (new.tmdb_id, new.title, new.overview);
+    END
+    ''',
+    '''
+    CREATE TRIGGER "tmdbData_movies_fts_delete" AFTER DELETE ON "tmdbData_movies" BEGIN
+        INSERT INTO "tmdbData_movies_fts" ("tmdbData_movies_fts", rowid, title, overview)
+        VALUES ('delete', old.tmdb_id, old.title, old.overview);
+    END
+    ''',
+    '''
+    CREATE TRIGGER "tmdbData_movies_fts_update" AFTER UPDATE OF title, overview ON "tmdbData_movies" BEGIN
+        INSERT INTO "tmdbData_movies_fts" ("tmdbData_movies_fts", rowid, title, overview)
+        VALUES ('delete', old.tmdb_id, old.title, old.overview);
+        INSERT INTO "tmdbData_movies_fts" (rowid, title, overview) VALUES (new.tmdb_id, new.title, new.overview);
+    END
+    ''',
+]
+REBUILD = '''INSERT INTO "tmdbData_movies_fts" ("tmdbData_movies_fts") VALUES ('rebuild')'''
+
+
+def create_triggers(schema_editor):
+    for trigger in TRIGGERS:
+        schema_editor.execute(trigger)
+
+# Create and fill the index, where the database supports it.
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(CREATE_TABLE)
+    except OperationalError:
+        # SQLite compiled without FTS5.
+        return
+    create_triggers(schema_editor)
+    schema_editor.execute(REBUILD)
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS "tmdbData_movies_fts_{name}"')
+    schema_editor.execute('DROP TABLE IF EXISTS "tmdbData_movies_fts"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0007_release_date_and_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
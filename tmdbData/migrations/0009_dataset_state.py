@@ -0,0 +1,30 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:44
+
+import time
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Create the single state row, starting from a version no cache can hold yet.
+def create_state(apps, schema_editor):
+    DatasetState = apps.get_model('tmdbData', 'DatasetState')
+    DatasetState.objects.create(pk=1, version=time.time_ns(), modified=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmdbData', '0008_movies_full_text_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+                ('modified', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
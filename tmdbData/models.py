@@ -1,4 +1,31 @@
 from django.db import models
+from django.db.models import Prefetch
+from django.utils.text import slugify
+
+# normalize a person or genre name (or its URL form with underscores) into the
+# lookup key stored in the slug columns, e.g. 'Leonardo_DiCaprio' -> 'leonardo-dicaprio'
+def name_slug(name):
+    return slugify(name.replace('_', ' '), allow_unicode=True)
+
+# mixin keeping the slug column of a named model in sync with its name on save
+class NameSlugMixin:
+    def save(self, *args, **kwargs):
+        self.slug = name_slug(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'slug'}
+        super().save(*args, **kwargs)
+
+# custom queryset for movies, bundling the lookups the API serializers rely on
+class MoviesQuerySet(models.QuerySet):
+    # select and prefetch every relation MovieSerializer touches, so a list of
+    # movies costs a fixed number of queries regardless of its length
+    def with_relations(self):
+        return self.select_related('imdb_id').prefetch_related(
+            Prefetch('genres', queryset=Genre.objects.order_by('pk')),
+            Prefetch('casts', queryset=Actor.objects.order_by('pk')),
+            Prefetch('directors', queryset=Director.objects.order_by('pk')),
+        )
 
 # defining a Django model class for IMDB entry
 class IMDBEntry(models.Model):
@@ -6,11 +33,13 @@ class IMDBEntry(models.Model):
     imdb_id = models.CharField(max_length=255, primary_key=True)
 
 # defining a model for director information
-class Director(models.Model):
+class Director(NameSlugMixin, models.Model):
     # unique identifier for a director
     director_id = models.CharField(max_length=100, primary_key=True)
     # director's name
     name = models.CharField(max_length=255)
+    # normalized, indexed form of the name used for lookups
+    slug = models.CharField(max_length=255, db_index=True, editable=False)
     # director's birth year, can be null or left blank
     birth_year = models.IntegerField(null=True, blank=True)
     # director's death year, can also be null or left blank
@@ -25,20 +54,24 @@ class Director(models.Model):
         return self.name
 
 # model for actor information
-class Actor(models.Model):
+class Actor(NameSlugMixin, models.Model):
     # actor's name
     name = models.CharField(max_length=255)
+    # normalized, indexed form of the name used for lookups
+    slug = models.CharField(max_length=255, db_index=True, editable=False)
 
     # string representation of an actor, showing their name
     def __str__(self):
         return self.name
 
 # model for genre information
-class Genre(models.Model):
+class Genre(NameSlugMixin, models.Model):
     # unique identifier for a genre
     genre_id = models.IntegerField(primary_key=True)
     # name of the genre
     name = models.CharField(max_length=100)
+    # normalized, indexed form of the name used for lookups
+    slug = models.CharField(max_length=100, db_index=True, editable=False)
 
     # string representation of a genre, showing its name
     def __str__(self):
@@ -64,7 +97,7 @@ class Movies(models.Model):
     # total number of votes the movie received
     vote_count = models.IntegerField()
     # release date of the movie
-    release_date = models.CharField(max_length=50)
+    release_date = models.DateField()
     # runtime of the movie in minutes
     runtime = models.IntegerField()
     # boolean field indicating if the movie is for adults
@@ -75,11 +108,115 @@ class Movies(models.Model):
     budget = models.BigIntegerField()
     # overview or summary of the movie
     overview = models.TextField()
+    # return on investment (revenue / budget), stored so rankings can use an index
+    roi = models.FloatField(default=0.0, editable=False)
+
+    # manager exposing the MoviesQuerySet helpers
+    objects = MoviesQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # serves the top-rated ranking and vote-ordered listings
+            models.Index(fields=['-vote_average', 'tmdb_id'], name='movies_vote_avg_idx'),
+            # serves the best-ROI ranking
+            models.Index(fields=['-roi', 'tmdb_id'], name='movies_roi_idx'),
+            # serve the search filters and sorts: release year ranges, vote count
+            # thresholds and runtime ranges, each ordered for keyset pages
+            models.Index(fields=['release_date', 'tmdb_id'], name='movies_release_idx'),
+            models.Index(fields=['-vote_count', 'tmdb_id'], name='movies_vote_count_idx'),
+            models.Index(fields=['runtime', 'tmdb_id'], name='movies_runtime_idx'),
+            # serve the adult filter combined with the rating and ROI sorts
+            models.Index(fields=['adult', '-vote_average', 'tmdb_id'], name='movies_adult_vote_avg_idx'),
+            models.Index(fields=['adult', '-roi', 'tmdb_id'], name='movies_adult_roi_idx'),
+        ]
 
     # string representation of a movie, showing its title
     def __str__(self):
         return self.title
 
+    # ROI of a movie; movies without a known budget get 0 instead of a division by zero
+    @staticmethod
+    def compute_roi(revenue, budget):
+        if not budget:
+            return 0.0
+        return revenue / budget
+
+    # keep the stored ROI in sync with revenue and budget on every save
+    def save(self, *args, **kwargs):
+        self.roi = self.compute_roi(self.revenue, self.budget)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ('revenue' in update_fields or 'budget' in update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'roi'}
+        super().save(*args, **kwargs)
+
+# precomputed position of a movie on a leaderboard ('top-rated', 'best-roi' or
+# 'genre:<genre slug>'), so top-N results and genre listings read a prefix of stored ranks
+class LeaderboardEntry(models.Model):
+    # name of the leaderboard
+    board = models.CharField(max_length=120)
+    # 1-based position of the movie on the board
+    rank = models.IntegerField()
+    # ranked movie
+    movie = models.ForeignKey(Movies, on_delete=models.CASCADE, related_name='leaderboard_entries')
+
+    class Meta:
+        indexes = [
+            # serves prefix reads and keyset pages of a board; not unique, since
+            # inserting a movie shifts the ranks below it in place
+            models.Index(fields=['board', 'rank'], name='leaderboard_rank_idx'),
+        ]
+
+    # string representation of an entry, showing its board and rank
+    def __str__(self):
+        return f"{self.board}#{self.rank}"
+
+# fingerprint of a CSV row from the last import, used by delta imports to skip unchanged rows
+class ImportFingerprint(models.Model):
+    # CSV source the row came from, e.g. 'movies' or 'casts'
+    source = models.CharField(max_length=50)
+    # key of the row within its source, e.g. the tmdb_id
+    key = models.CharField(max_length=100)
+    # hash of the row contents
+    digest = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'key'], name='unique_import_fingerprint'),
+        ]
+
+    # string representation of a fingerprint, showing its source and key
+    def __str__(self):
+        return f"{self.source}:{self.key}"
 
+# progress of one stage of a resumable import, committed together with each batch
+class ImportCheckpoint(models.Model):
+    # name of the import stage, e.g. 'movies'
+    stage = models.CharField(max_length=50, unique=True)
+    # batch size the stage was run with; resuming requires the same size
+    batch_size = models.IntegerField()
+    # number of batches committed so far
+    batches = models.IntegerField(default=0)
+    # rows read and rows written by the committed batches
+    rows = models.IntegerField(default=0)
+    changed = models.IntegerField(default=0)
+    # whether every batch of the stage is committed
+    completed = models.BooleanField(default=False)
+    # when the last batch was committed
+    updated_at = models.DateTimeField(auto_now=True)
 
-    
\ No newline at end of file
+    # string representation of a checkpoint, showing its stage and progress
+    def __str__(self):
+        return f"{self.stage}: {self.batches} batches"
+
+# version of the dataset served by the read endpoints, kept in a single row so
+# every process (API workers, import_tmdb, populate.py) sees the same one
+class DatasetState(models.Model):
+    # changes whenever movies are written or bulk loaded; cached responses,
+    # ETags, the catalog snapshot and the similarity index are keyed on it
+    version = models.BigIntegerField()
+    # when the version last changed
+    modified = models.DateTimeField()
+
+    # string representation of the state, showing its version
+    def __str__(self):
+        return f"dataset version {self.version}"
@@ -0,0 +1,143 @@
+import base64
+import bisect
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+# Keyset (cursor) pagination. Pages are ordered by the view's keyset_ordering,
+# which must end in a unique field, e.g. ('-vote_average', 'tmdb_id'). The cursor
+# holds the ordering values of the last row served, so every page is fetched
+# with an indexed range condition instead of COUNT(*) plus a growing OFFSET,
+# and deep pages cost the same as the first one.
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    # Clients may ask for a different page size, up to max_page_size.
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+    # Used for views that don't define keyset_ordering.
+    default_ordering = ('-vote_average', 'tmdb_id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position = self.start_page(request, view, queryset)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        # Fetch one extra row to learn whether there is a next page.
+        return self.finish_page(list(queryset[:self.limit + 1]))
+
+    # Keyset pagination over an in-memory sequence of the given length, already
+    # sorted in keyset order; key(index) gives the ordering values of an item.
+    # Returns the indexes of the page's items.
+    def paginate_sequence(self, length, key, request, view=None):
+        position = self.start_page(request, view)
+        start = 0
+        if position is not None:
+            try:
+                start = bisect.bisect_right(range(length), self.sort_key(position), key=lambda index: self.sort_key(key(index)))
+            except TypeError:
+                raise NotFound(self.invalid_cursor_message)
+        return self.finish_page(list(range(start, min(start + self.limit + 1, length))), key)
+
+    # Read the page size and cursor of a request; returns the cursor position.
+    def start_page(self, request, view=None, queryset=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.default_ordering)
+        self.limit = self.get_page_size(request)
+        position, self.rank = self.decode_cursor(request, queryset)
+        return position
+
+    # Ascending sort key of ordering values (the keyset fields are numeric).
+    def sort_key(self, position):
+        return tuple(-value if field.startswith('-') else value for field, value in zip(self.ordering, position))
+
+    def finish_page(self, page, position=None):
+        self.has_next = len(page) > self.limit
+        page = page[:self.limit]
+        # 1-based rank of the first row of this page within the whole listing.
+        self.start_rank = self.rank + 1
+        self.last_position = (position or self.position)(page[-1]) if page else None
+        self.last_rank = self.rank + len(page)
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    # Ordering values of a row (a model instance or a values() dict), in keyset order.
+    def position(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field.lstrip('-')] for field in self.ordering]
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    # Condition selecting the rows that sort after the given position.
+    def after(self, position):
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    # Dates in the position are encoded as ISO strings, which filters accept back.
+    def encode_cursor(self, position, rank):
+        return base64.urlsafe_b64encode(json.dumps([position, rank], cls=DjangoJSONEncoder).encode()).decode()
+
+    # (position, rank) of the last row of the previous page, or (None, 0) on the first page.
+    # Given the queryset being paginated, position values are converted to the types
+    # of their fields, so a tampered cursor is rejected here rather than in the query.
+    def decode_cursor(self, request, queryset=None):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, 0
+        try:
+            position, rank = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.ordering) or not isinstance(rank, int):
+                raise ValueError
+            if queryset is not None:
+                position = [self.cursor_value(queryset, field, value) for field, value in zip(self.ordering, position)]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, rank
+
+    # A cursor value as the type of its ordering field, a model field or an annotation.
+    def cursor_value(self, queryset, field, value):
+        name = field.lstrip('-')
+        annotation = queryset.query.annotations.get(name)
+        model_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+        value = model_field.to_python(value)
+        if value is None:
+            raise ValueError
+        return value
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_position, self.last_rank))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
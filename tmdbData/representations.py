@@ -0,0 +1,70 @@
+from collections import defaultdict
+from .metrics import timed
+from .models import Movies
+
+# Movie columns read by the lean representation path, in MovieSerializer field order.
+MOVIE_VALUES = ('tmdb_id', 'title', 'release_date', 'vote_average', 'vote_count', 'overview',
+                'runtime', 'adult', 'revenue', 'budget', 'imdb_id')
+
+# (through model, target name lookup, target key) of each many-to-many relation in the output.
+# Names are ordered by the target's primary key, as in MoviesQuerySet.with_relations().
+RELATIONS = {
+    'genres': (Movies.genres.through, 'genre__name', 'genre_id'),
+    'casts': (Movies.casts.through, 'actor__name', 'actor_id'),
+    'directors': (Movies.directors.through, 'director__name', 'director_id'),
+}
+
+
+# Narrow a movie queryset to the plain column values the lean path needs, plus
+# any extra fields or annotations (e.g. a keyset field such as 'rank').
+def movie_values(queryset, *extra):
+    fields = MOVIE_VALUES + tuple(field for field in extra if field not in MOVIE_VALUES)
+    return queryset.select_related(None).prefetch_related(None).values(*fields)
+
+# tmdb_id -> related names for one relation, fetched with a single query.
+def related_names(relation, movie_ids):
+    through, name_lookup, order = RELATIONS[relation]
+    names = defaultdict(list)
+    rows = through.objects.filter(movies_id__in=movie_ids).order_by(order).values_list('movies_id', name_lookup)
+    for movie_id, name in rows:
+        names[movie_id].append(name)
+    return names
+
+# Dates are stored as text or as date objects; both are rendered as ISO strings.
+def format_date(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+# Read-only movie representations built straight from movie_values() rows, with
+# one query per relation for the whole list. The output is identical to
+# MovieSerializer's; start_rank numbers the 'index' field (None leaves it null).
+def represent_movies(rows, start_rank=None):
+    rows = list(rows)
+    movie_ids = [row['tmdb_id'] for row in rows]
+    relations = {relation: related_names(relation, movie_ids) for relation in RELATIONS} if rows else {}
+    return build_representations(rows, relations, start_rank)
+
+# Assemble the output dicts from movie rows and their related names.
+@timed('serialize')
+def build_representations(rows, relations, start_rank):
+    genres, casts, directors = (relations.get(relation, {}) for relation in ('genres', 'casts', 'directors'))
+    data = []
+    for position, row in enumerate(rows):
+        tmdb_id = row['tmdb_id']
+        data.append({
+            'tmdb_id': tmdb_id,
+            'index': start_rank + position if start_rank is not None else None,
+            'title': row['title'],
+            'release_date': format_date(row['release_date']),
+            'vote_average': float(row['vote_average']),
+            'vote_count': row['vote_count'],
+            'genres': genres.get(tmdb_id, []),
+            'overview': row['overview'],
+            'casts': casts.get(tmdb_id, []),
+            'directors': directors.get(tmdb_id, []),
+            'runtime': row['runtime'],
+            'adult': row['adult'],
+            'revenue': row['revenue'],
+            'budget': row['budget'],
+            'imdb_id': row['imdb_id'],
+        })
+    return data
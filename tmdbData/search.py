@@ -0,0 +1,62 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# FTS5 index of movie titles and overviews (see migration 0008).
+FTS_TABLE = 'tmdbData_movies_fts'
+# BM25 column weights: a match in the title counts ten times one in the overview.
+TITLE_WEIGHT = 10.0
+OVERVIEW_WEIGHT = 1.0
+# A search word, optionally ending in '*' to match it as a prefix.
+WORD_PATTERN = re.compile(r'(\w+)(\*?)')
+
+# Whether the full-text index exists, per database.
+_fts_tables = {}
+
+
+# Whether the database has the FTS5 index; otherwise searches fall back to icontains.
+def fts_available():
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        _fts_tables[name] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[name]
+
+# Words of a search text as (word, is_prefix) pairs.
+def search_words(text):
+    return [(word, bool(star)) for word, star in WORD_PATTERN.findall(text)]
+
+# FTS5 query matching movies containing every word of the text. Words are quoted,
+# so user input can't use FTS5 operators; 'wor*' matches words starting with 'wor'.
+def match_expression(text):
+    return ' '.join(f'"{word}"' + ('*' if prefix else '') for word, prefix in search_words(text))
+
+# Movies of a queryset whose title or overview contains every word of the text.
+def matching_movies(queryset, text):
+    if fts_available():
+        matches = RawSQL(f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s', [match_expression(text)])
+        return queryset.filter(tmdb_id__in=matches)
+    for word, _ in search_words(text):
+        queryset = queryset.filter(Q(title__icontains=word) | Q(overview__icontains=word))
+    return queryset
+
+# One page of the movies matching the text, as (tmdb_id, bm25 score) pairs, best
+# match first; lower scores are better. Only matches among movies (a queryset, or
+# None for all movies) that rank after the position, a (score, tmdb_id) pair, are
+# returned, at most limit of them: ranking, filters and paging all run in one query.
+def ranked_page(text, limit, movies=None, after=None):
+    sql = f'SELECT rowid, bm25("{FTS_TABLE}", %s, %s) AS score FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s'
+    params = [TITLE_WEIGHT, OVERVIEW_WEIGHT, match_expression(text)]
+    if movies is not None:
+        movies_sql, movies_params = movies.values('tmdb_id').query.sql_with_params()
+        sql += f' AND rowid IN ({movies_sql})'
+        params.extend(movies_params)
+    sql = f'SELECT rowid, score FROM ({sql})'
+    if after is not None:
+        sql += ' WHERE score > %s OR (score = %s AND rowid > %s)'
+        params.extend([after[0], after[0], after[1]])
+    sql += ' ORDER BY score, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
@@ -1,15 +1,25 @@
+import uuid
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Max
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from .models import Director, Actor, Genre, IMDBEntry, Movies
+from .cache import bump_dataset_version
+from .leaderboards import BEST_ROI, TOP_RATED, genre_board, insert_movies
+from .models import Director, Actor, Genre, IMDBEntry, Movies, name_slug
+from .search import search_words
 
-# IndexField is a custom field that returns the index of a movie in a list of movies.
+# rank_map builds a pk -> position lookup for an ordered list of movies, so ranks are computed once per response.
+def rank_map(movies, start=1):
+    return {movie.pk: index for index, movie in enumerate(movies, start=start)}
+
+# IndexField is a custom field that returns the rank of a movie, looked up in the 'ranks' map from the context.
 class IndexField(serializers.Field):
     def to_representation(self, value):
-        movies_list = self.context.get('movies_list', [])
-        for index, movie in enumerate(movies_list, start=1):
-            if movie == value:
-                return index
-        return None
+        ranks = self.context.get('ranks')
+        if ranks is None:
+            return None
+        return ranks.get(value.pk)
     # This field is read-only, so it does not need to support write operations.
     def to_internal_value(self, data):
         raise NotImplementedError("IndexField is read-only.")
@@ -100,20 +110,170 @@ class MovieSerializer(serializers.ModelSerializer):
         directors_data = validated_data.pop('directors', [])
         movie = Movies.objects.create(**validated_data) # Create the movie instance
 
-        # Add genres, casts, and directors to the movie
-        for genre_data in genres_data:
-            genre, _ = Genre.objects.get_or_create(name=genre_data)
-            movie.genres.add(genre)
-
-        for actor_data in casts_data:
-            actor, _ = Actor.objects.get_or_create(name=actor_data)
-            movie.casts.add(actor)
-
-        for director_data in directors_data:
-            director, _ = Director.objects.get_or_create(name=director_data)
-            movie.directors.add(director)
+        # Validation already resolved the names to instances, so each relation is one insert.
+        movie.genres.add(*genres_data)
+        movie.casts.add(*casts_data)
+        movie.directors.add(*directors_data)
         return movie
 
     class Meta:
         model = Movies
-        fields = '__all__'  # Serialize all fields of the Movies model.
\ No newline at end of file
+        exclude = ['roi']  # Serialize all fields of the Movies model except the stored ROI sort key.
+
+# Fields the search endpoint can sort by; a '-' prefix sorts descending.
+SEARCH_SORT_FIELDS = ('vote_average', 'roi', 'vote_count', 'release_date', 'runtime')
+
+# MovieSearchSerializer validates the query parameters of the search endpoint.
+class MovieSearchSerializer(serializers.Serializer):
+    # Words to find in titles and overviews; 'wor*' matches words starting with 'wor'.
+    q = serializers.CharField(required=False, max_length=200)
+    # Genre, actor and director names, matched on their normalized slugs.
+    genre = serializers.CharField(required=False)
+    actor = serializers.CharField(required=False)
+    director = serializers.CharField(required=False)
+    # Inclusive range of release years.
+    year_from = serializers.IntegerField(required=False, min_value=1, max_value=9998)
+    year_to = serializers.IntegerField(required=False, min_value=1, max_value=9998)
+    # Inclusive runtime range, in minutes.
+    runtime_min = serializers.IntegerField(required=False, min_value=0)
+    runtime_max = serializers.IntegerField(required=False, min_value=0)
+    # Minimum number of votes.
+    min_votes = serializers.IntegerField(required=False, min_value=0)
+    adult = serializers.BooleanField(required=False)
+    sort = serializers.ChoiceField(
+        choices=[prefix + field for field in SEARCH_SORT_FIELDS for prefix in ('-', '')], default='-vote_average')
+
+    def validate_q(self, value):
+        if not search_words(value):
+            raise serializers.ValidationError("Search text must contain at least one word.")
+        return value
+
+    def validate(self, data):
+        if data.get('year_from', 0) > data.get('year_to', 9999):
+            raise serializers.ValidationError("year_from cannot be later than year_to.")
+        if 'runtime_max' in data and data.get('runtime_min', 0) > data['runtime_max']:
+            raise serializers.ValidationError("runtime_min cannot be greater than runtime_max.")
+        return data
+
+# Identifier for a director created through the API, which has no IMDb person ID.
+def generated_director_id():
+    return f'local-{uuid.uuid4().hex}'
+
+# slug -> ID of the stored rows of a named model matching any of the names on
+# their normalized slug; where several rows share a slug, the lowest ID wins.
+def slug_ids(model, id_field, names):
+    slugs = {name_slug(name) for name in names}
+    if not slugs:
+        return {}
+    ids = {}
+    for slug, pk in model.objects.filter(slug__in=slugs).order_by('-pk').values_list('slug', id_field):
+        ids[slug] = pk
+    return ids
+
+# slug -> name for the names whose slug matched no stored row, one (the first in
+# sorted order) per slug, so 'Drama' and 'drama' in one request create one genre.
+def new_names(names, ids):
+    new = {}
+    for name in sorted(names):
+        new.setdefault(name_slug(name), name)
+    return {slug: name for slug, name in new.items() if slug not in ids}
+
+# MovieBulkListSerializer creates every movie of a bulk request in one transaction
+# with a fixed number of queries: related names are resolved on their normalized
+# slugs with one query per model, so 'action' finds the existing 'Action', missing
+# genres, actors, directors and IMDb entries are created with bulk_create, and
+# each relation's through rows are written in one batch. Placing the movies on
+# their leaderboards takes three queries per board, whatever the number of movies.
+class MovieBulkListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        tmdb_ids = [movie['tmdb_id'] for movie in attrs]
+        if len(set(tmdb_ids)) != len(tmdb_ids):
+            raise ValidationError('Each movie must have a distinct tmdb_id.')
+        existing = sorted(Movies.objects.filter(tmdb_id__in=tmdb_ids).values_list('tmdb_id', flat=True))
+        if existing:
+            raise ValidationError(f'Movies with tmdb_id {", ".join(map(str, existing))} already exist.')
+        return attrs
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            IMDBEntry.objects.bulk_create(
+                [IMDBEntry(imdb_id=movie['imdb_id']) for movie in validated_data], ignore_conflicts=True)
+            genre_ids = self.genre_ids(self.names(validated_data, 'genres'))
+            director_ids = self.director_ids(self.names(validated_data, 'directors'))
+            actor_ids = self.actor_ids(self.names(validated_data, 'casts'))
+            movies = []
+            for data in validated_data:
+                fields = {name: value for name, value in data.items() if name not in ('genres', 'casts', 'directors', 'imdb_id')}
+                movies.append(Movies(**fields, imdb_id_id=data['imdb_id'],
+                                     roi=Movies.compute_roi(data['revenue'], data['budget'])))
+            Movies.objects.bulk_create(movies)
+            self.link(Movies.genres.through, 'genre_id', validated_data, 'genres', genre_ids)
+            self.link(Movies.casts.through, 'actor_id', validated_data, 'casts', actor_ids)
+            self.link(Movies.directors.through, 'director_id', validated_data, 'directors', director_ids)
+            # bulk_create sends no save signals: place the new movies on their
+            # leaderboards in the same transaction and move the dataset version once
+            # the rows are committed.
+            board_movies = defaultdict(list)
+            for movie, data in zip(movies, validated_data):
+                for board in {TOP_RATED, BEST_ROI, *(genre_board(name_slug(name)) for name in data.get('genres', []))}:
+                    board_movies[board].append(movie)
+            for board, ranked in board_movies.items():
+                insert_movies(board, ranked)
+            transaction.on_commit(bump_dataset_version)
+        return movies
+
+    # Distinct names of one relation across all movies of the request.
+    def names(self, validated_data, relation):
+        return {name for movie in validated_data for name in movie.get(relation, [])}
+
+    # name -> genre_id; new genres get the next free IDs.
+    def genre_ids(self, names):
+        ids = slug_ids(Genre, 'genre_id', names)
+        new_slugs = new_names(names, ids)
+        if new_slugs:
+            next_id = (Genre.objects.aggregate(last=Max('genre_id'))['last'] or 0) + 1
+            new_genres = [Genre(genre_id=genre_id, name=name, slug=slug)
+                          for genre_id, (slug, name) in enumerate(new_slugs.items(), start=next_id)]
+            Genre.objects.bulk_create(new_genres)
+            ids.update((genre.slug, genre.genre_id) for genre in new_genres)
+        return {name: ids[name_slug(name)] for name in names}
+
+    # name -> director_id; new directors get generated IDs.
+    def director_ids(self, names):
+        ids = slug_ids(Director, 'director_id', names)
+        new_slugs = new_names(names, ids)
+        if new_slugs:
+            new_directors = [Director(director_id=generated_director_id(), name=name, slug=slug)
+                             for slug, name in new_slugs.items()]
+            Director.objects.bulk_create(new_directors)
+            ids.update((director.slug, director.director_id) for director in new_directors)
+        return {name: ids[name_slug(name)] for name in names}
+
+    # name -> actor id; new actors are inserted, then read back for their generated IDs.
+    def actor_ids(self, names):
+        ids = slug_ids(Actor, 'id', names)
+        new_slugs = new_names(names, ids)
+        if new_slugs:
+            Actor.objects.bulk_create(Actor(name=name, slug=slug) for slug, name in new_slugs.items())
+            ids.update(slug_ids(Actor, 'id', new_slugs.values()))
+        return {name: ids[name_slug(name)] for name in names}
+
+    # Write the through rows of one relation for every movie in a single batch.
+    def link(self, through, target_field, validated_data, relation, ids):
+        rows = {(movie['tmdb_id'], ids[name]) for movie in validated_data for name in movie.get(relation, [])}
+        if rows:
+            through.objects.bulk_create(through(movies_id=movie_id, **{target_field: target_id}) for movie_id, target_id in rows)
+
+# MovieBulkSerializer validates one movie of a bulk create request. Related
+# names and the IMDb ID are plain strings, resolved (and created if missing)
+# for the whole request by MovieBulkListSerializer.
+class MovieBulkSerializer(MovieSerializer):
+    genres = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+    casts = serializers.ListField(child=serializers.CharField(max_length=255), required=False)
+    directors = serializers.ListField(child=serializers.CharField(max_length=255), required=False)
+    imdb_id = serializers.RegexField(r'^tt\d+$', max_length=255)
+
+    class Meta(MovieSerializer.Meta):
+        list_serializer_class = MovieBulkListSerializer
+        # Uniqueness of tmdb_id is checked once for the whole request.
+        extra_kwargs = {'tmdb_id': {'validators': []}}
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import verified_tokens
+from .cache import bump_dataset_version
+from .leaderboards import BEST_ROI, TOP_RATED, genre_board, movie_boards, place_movie, rebuild_board, remove_movie, sync_genre_boards
+from .models import Movies
+
+# Any write to a movie changes the dataset served by the read endpoints.
+@receiver(post_save, sender=Movies)
+@receiver(post_delete, sender=Movies)
+def movie_changed(sender, instance, **kwargs):
+    bump_dataset_version()
+
+# Relations are added after the movie row is saved, so they bump the version too.
+@receiver(m2m_changed, sender=Movies.genres.through)
+@receiver(m2m_changed, sender=Movies.casts.through)
+@receiver(m2m_changed, sender=Movies.directors.through)
+def movie_relations_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_dataset_version()
+
+# A saved movie is placed on its leaderboards at the rank its values give it; a
+# new movie has no genres yet, so only the global boards apply.
+@receiver(post_save, sender=Movies)
+def movie_saved_rank(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    place_movie(instance, [TOP_RATED, BEST_ROI] if created else movie_boards(instance))
+
+# A deleted movie leaves its leaderboards before its entries are cascaded away.
+@receiver(pre_delete, sender=Movies)
+def movie_deleted_rank(sender, instance, **kwargs):
+    remove_movie(instance.pk)
+
+# Genre changes move the movies concerned on and off the genre leaderboards.
+@receiver(m2m_changed, sender=Movies.genres.through)
+def movie_genres_changed_rank(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_genre_boards(instance)
+    elif pk_set is None:
+        # A genre was cleared of all its movies; its board is simply recomputed.
+        rebuild_board(genre_board(instance.slug))
+    else:
+        for movie in Movies.objects.filter(pk__in=pk_set):
+            sync_genre_boards(movie)
+
+# Deleted tokens must stop authenticating immediately in this process.
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    verified_tokens.evict(instance.key)
+
+# A changed or deleted user (deactivated, new password) drops its cached tokens.
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    verified_tokens.evict_user(instance.pk)
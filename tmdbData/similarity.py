@@ -0,0 +1,115 @@
+import heapq
+import threading
+from array import array
+from .cache import get_dataset_version
+from .models import Movies
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # optional; the pure-Python index gives the same results
+    numpy = sparse = None
+
+# Weight of one shared feature in the similarity score: sharing a director says
+# more about a movie than sharing an actor, and an actor more than a genre.
+FEATURE_WEIGHTS = {'genres': 1.0, 'casts': 2.0, 'directors': 3.0}
+# Weight of vote proximity: movies rated alike gain up to this much.
+VOTE_WEIGHT = 1.0
+# Through-table column holding the feature ID of each relation.
+FEATURE_COLUMNS = {'genres': 'genre_id', 'casts': 'actor_id', 'directors': 'director_id'}
+
+
+# Movie feature matrix for one dataset version: one row per movie (tmdb_id
+# order), one column per genre, actor and director, 1 where the movie has the
+# feature. Multiplying it by a movie's row, weighted per column, gives every
+# movie's summed weight of shared features, so the candidates of a query and
+# their overlap scores are one sparse matrix-vector product (scipy), or the
+# equivalent walk over an inverted index of feature columns without it.
+class SimilarityIndex:
+    def __init__(self, version, rows, links):
+        self.version = version
+        self.tmdb_ids = array('q', (row[0] for row in rows))
+        self.vote_average = array('d', (row[2] for row in rows))
+        self.positions = {tmdb_id: position for position, tmdb_id in enumerate(self.tmdb_ids)}
+        self.positions.update((row[1], position) for position, row in enumerate(rows))
+        # (position, column) entries of the matrix, and the weight of each column.
+        columns = {}
+        weights = array('d')
+        entries = []
+        for relation, pairs in links.items():
+            for movie_id, feature in pairs:
+                if movie_id not in self.positions:
+                    continue
+                column = columns.get((relation, feature))
+                if column is None:
+                    column = columns[relation, feature] = len(weights)
+                    weights.append(FEATURE_WEIGHTS[relation])
+                entries.append((self.positions[movie_id], column))
+        self.weights = weights
+        # The path is fixed when the index is built: matrix is None without scipy.
+        self.matrix = None
+        if sparse is not None:
+            positions, columns_ = zip(*entries) if entries else ((), ())
+            self.matrix = sparse.csr_matrix((numpy.ones(len(entries)), (positions, columns_)),
+                                            shape=(len(rows), len(weights)))
+            self.column_weights = numpy.frombuffer(weights, dtype=numpy.float64)
+        else:
+            self.rows = [array('l') for _ in rows]
+            self.columns = [array('l') for _ in weights]
+            for position, column in entries:
+                self.rows[position].append(column)
+                self.columns[column].append(position)
+
+    # Load the features of every movie from the database for the given dataset version.
+    @classmethod
+    def load(cls, version):
+        rows = list(Movies.objects.order_by('tmdb_id').values_list('tmdb_id', 'imdb_id', 'vote_average'))
+        links = {relation: list(getattr(Movies, relation).through.objects.values_list('movies_id', column))
+                 for relation, column in FEATURE_COLUMNS.items()}
+        return cls(version, rows, links)
+
+    # Overlap scores of the movies sharing a feature with the movie at a position, as {position: score}.
+    def overlaps(self, position):
+        if self.matrix is not None:
+            query = self.matrix[position].multiply(self.column_weights).tocsr()
+            scores = self.matrix.dot(query.T).tocoo()
+            return dict(zip(scores.row.tolist(), scores.data.tolist()))
+        scores = {}
+        for column in self.rows[position]:
+            weight = self.weights[column]
+            for other in self.columns[column]:
+                scores[other] = scores.get(other, 0.0) + weight
+        return scores
+
+    # TMDB IDs of the k movies most similar to a movie (TMDB or IMDb ID), best
+    # first, or None for an unknown movie. Only movies sharing a genre, actor or
+    # director are candidates; vote proximity then separates close scores.
+    def similar(self, movie_id, k):
+        position = self.positions.get(movie_id)
+        if position is None:
+            return None
+        overlaps = self.overlaps(position)
+        overlaps.pop(position, None)
+        vote = self.vote_average[position]
+        scored = ((score + VOTE_WEIGHT * (1 - abs(self.vote_average[other] - vote) / 10), -self.tmdb_ids[other])
+                  for other, score in overlaps.items())
+        return [-tmdb_id for _, tmdb_id in heapq.nlargest(k, scored)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Similarity index of the current dataset version. It is rebuilt on first use
+# after the dataset version moves, e.g. after an import, and swapped in as one
+# reference, like the catalog snapshot.
+def get_similarity_index():
+    global _index
+    version = get_dataset_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version:
+                index = _index = SimilarityIndex.load(version)
+    return index
@@ -0,0 +1,113 @@
+import itertools
+import threading
+from array import array
+from django.conf import settings
+from .cache import get_dataset_version
+from .leaderboards import BEST_ROI, TOP_RATED
+from .metrics import timed
+from .models import Movies
+from .representations import RELATIONS, movie_values, represent_movies
+
+# Movies represented per query batch while a snapshot loads.
+LOAD_CHUNK_SIZE = 1000
+
+# Through-table lookup of the slug indexed for each relation.
+SLUG_LOOKUPS = {
+    'genres': 'genre__slug',
+    'casts': 'actor__slug',
+    'directors': 'director__slug',
+}
+
+
+# Read-only, in-memory copy of the catalog for one dataset version. Numeric
+# columns are compact arrays indexed by position (movies in tmdb_id order),
+# rendered movies are kept ready to serve, and inverted indexes map each
+# genre/actor/director slug to its movies' positions, pre-sorted like the
+# listings. Rankings are sorted once at load time, so top-N results and
+# listing pages are slices.
+class CatalogSnapshot:
+    def __init__(self, version, rows, movies, links):
+        self.version = version
+        self.tmdb_ids = array('q', (row['tmdb_id'] for row in rows))
+        self.vote_average = array('d', (row['vote_average'] for row in rows))
+        self.revenue = array('q', (row['revenue'] for row in rows))
+        self.budget = array('q', (row['budget'] for row in rows))
+        self.runtime = array('l', (row['runtime'] for row in rows))
+        self.roi = array('d', map(Movies.compute_roi, self.revenue, self.budget))
+        self.movies = movies
+        positions = range(len(rows))
+        self.rankings = {
+            TOP_RATED: array('l', sorted(positions, key=self.vote_key)),
+            BEST_ROI: array('l', sorted(positions, key=lambda position: (-self.roi[position], self.tmdb_ids[position]))),
+        }
+        self.indexes = {}
+        for relation, pairs in links.items():
+            index = {}
+            for slug, position in pairs:
+                index.setdefault(slug, set()).add(position)
+            self.indexes[relation] = {slug: array('l', sorted(members, key=self.vote_key)) for slug, members in index.items()}
+
+    # Load the catalog from the database for the given dataset version.
+    @classmethod
+    def load(cls, version):
+        rows = list(movie_values(Movies.objects.order_by('tmdb_id')))
+        movies = []
+        for start in range(0, len(rows), LOAD_CHUNK_SIZE):
+            movies.extend(represent_movies(rows[start:start + LOAD_CHUNK_SIZE]))
+        positions = {row['tmdb_id']: position for position, row in enumerate(rows)}
+        links = {}
+        for relation, slug_lookup in SLUG_LOOKUPS.items():
+            through = RELATIONS[relation][0]
+            pairs = through.objects.values_list(slug_lookup, 'movies_id')
+            links[relation] = [(slug, positions[movie_id]) for slug, movie_id in pairs if movie_id in positions]
+        return cls(version, rows, movies, links)
+
+    # Sort key of the vote-ordered listings: vote average descending, then tmdb_id.
+    def vote_key(self, position):
+        return -self.vote_average[position], self.tmdb_ids[position]
+
+    # Positions of the first top_n movies of a global ranking.
+    def top(self, board, top_n):
+        return self.rankings[board][:top_n]
+
+    # Positions of the movies of a genre, actor or director slug, in listing order.
+    def listing(self, relation, slug):
+        return self.indexes[relation].get(slug, array('l'))
+
+    # Function giving the keyset ordering values of the item at an index of a listing.
+    def keyset(self, positions, ordering):
+        columns = {'vote_average': self.vote_average, 'tmdb_id': self.tmdb_ids}
+        fields = [field.lstrip('-') for field in ordering]
+
+        def key(index):
+            # 'rank' is the 1-based place in the listing itself.
+            return [index + 1 if field == 'rank' else columns[field][positions[index]] for field in fields]
+        return key
+
+    # Rendered movies at the given positions, ranked from start_rank.
+    @timed('serialize')
+    def represent(self, positions, start_rank=None):
+        if start_rank is None:
+            return [self.movies[position] for position in positions]
+        return [dict(self.movies[position], index=rank) for rank, position in zip(itertools.count(start_rank), positions)]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+# Snapshot of the current dataset version, or None unless TMDB_SNAPSHOT_ENABLED.
+# A new snapshot is loaded when the dataset version moves and swapped in as one
+# reference; requests arriving meanwhile wait for it rather than serve stale data.
+def get_snapshot():
+    global _snapshot
+    if not getattr(settings, 'TMDB_SNAPSHOT_ENABLED', False):
+        return None
+    version = get_dataset_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _snapshot_lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = _snapshot = CatalogSnapshot.load(version)
+    return snapshot
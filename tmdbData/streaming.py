@@ -0,0 +1,77 @@
+import itertools
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from .representations import movie_values, represent_movies
+
+# Supported streaming formats and their content types.
+STREAM_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+# Encode data the way DRF's JSONRenderer does, so streamed and regular responses match.
+def dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=not api_settings.UNICODE_JSON,
+                      allow_nan=not api_settings.STRICT_JSON,
+                      separators=(',', ':') if api_settings.COMPACT_JSON else (', ', ': '))
+
+# Renderer for newline-delimited JSON, so views can negotiate 'Accept: application/x-ndjson'.
+class NDJSONRenderer(BaseRenderer):
+    media_type = STREAM_CONTENT_TYPES['ndjson']
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(iter_ndjson(items)).encode()
+
+# Streaming format requested by the client: '?stream=json|ndjson', a negotiated
+# NDJSON renderer, or a JSON array when more than TMDB_STREAM_THRESHOLD rows are asked for.
+def requested_stream_format(request, size=None):
+    stream = request.query_params.get('stream')
+    if stream in STREAM_CONTENT_TYPES:
+        return stream
+    if getattr(request, 'accepted_renderer', None) is not None and request.accepted_renderer.format == 'ndjson':
+        return 'ndjson'
+    if size is not None and size > getattr(settings, 'TMDB_STREAM_THRESHOLD', 1000):
+        return 'json'
+    return None
+
+# Ranked movie representations of an ordered queryset, read chunk by chunk with
+# one relation query per chunk so memory stays bounded by the chunk size.
+def iter_movie_data(queryset, chunk_size, start_rank=1):
+    movies = movie_values(queryset).iterator(chunk_size=chunk_size)
+    rank = start_rank
+    while True:
+        chunk = list(itertools.islice(movies, chunk_size))
+        if not chunk:
+            return
+        yield from represent_movies(chunk, start_rank=rank)
+        rank += len(chunk)
+
+# Encode movie dicts as a JSON array, one element at a time.
+def iter_json_array(items):
+    yield '['
+    for position, item in enumerate(items):
+        yield (',' if position else '') + dumps(item)
+    yield ']'
+
+# Encode movie dicts as newline-delimited JSON.
+def iter_ndjson(items):
+    for item in items:
+        yield dumps(item) + '\n'
+
+# Stream an ordered movie queryset as a JSON array or NDJSON without building the
+# whole list in memory.
+def stream_movies(queryset, stream_format='json', chunk_size=None):
+    chunk_size = chunk_size or getattr(settings, 'TMDB_STREAM_CHUNK_SIZE', 500)
+    items = iter_movie_data(queryset, chunk_size)
+    body = iter_ndjson(items) if stream_format == 'ndjson' else iter_json_array(items)
+    return StreamingHttpResponse(body, content_type=STREAM_CONTENT_TYPES[stream_format])
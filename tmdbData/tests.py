@@ -1,8 +1,38 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import functools
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
-from .models import Movies, Actor, Director, Genre, IMDBEntry
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from .models import Movies, Actor, DatasetState, Director, Genre, IMDBEntry, ImportCheckpoint, LeaderboardEntry
+from .authentication import verified_tokens
+from .cache import bump_dataset_version, cache_stats, forget_dataset_state, get_dataset_version, reset_cache_stats
+from .importer import CatalogImporter
+from .leaderboards import rebuild_leaderboards
+from .metrics import registry
+from .representations import movie_values, represent_movies
+from .serializers import MovieSerializer, rank_map
+from . import similarity
 
 class MoviesModelTest(TestCase):
     """ Test module for Movies model """
@@ -99,7 +129,7 @@ class MoviesApiTestCase(TestCase):
         self.movie.casts.add(actor)
         response = self.client.get(reverse('movies-by-actor', kwargs={'actor_name': 'Martin_Balsam'}))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(any(item['title'] == self.movie.title for item in response.data))
+        self.assertTrue(any(item['title'] == self.movie.title for item in response.data['results']))
 
     def test_get_movies_by_genre(self):
         """ Test retrieving movies by a specific genre. """
@@ -128,3 +158,1135 @@ class MoviesApiTestCase(TestCase):
         response = self.client.get(reverse('best-roi-movies', kwargs={'top_n': 5}))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(len(response.data) <= 5)
+
+# Create a movie with its own IMDb entry and placeholder values; keyword
+# arguments override fields, and genres, casts and directors are linked.
+def make_movie(tmdb_id, genres=(), casts=(), directors=(), **overrides):
+    fields = {
+        'title': f"Movie {tmdb_id}", 'vote_average': 5, 'vote_count': 10, 'release_date': '2000-01-01',
+        'runtime': 90, 'adult': False, 'revenue': 100, 'budget': 10, 'overview': "",
+    }
+    fields.update(overrides)
+    if 'imdb_id' not in fields:
+        fields['imdb_id'] = IMDBEntry.objects.create(imdb_id=f"tt{tmdb_id:07d}")
+    movie = Movies.objects.create(tmdb_id=tmdb_id, **fields)
+    movie.genres.add(*genres)
+    movie.casts.add(*casts)
+    movie.directors.add(*directors)
+    return movie
+
+class AuthenticatedTestCase(TestCase):
+    """ Base for API tests: an authenticated client and an empty response cache """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='tester', password='secret')
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+
+class MoviesQueryCountTest(AuthenticatedTestCase):
+    """ Test that list endpoints run a constant number of queries """
+
+    def setUp(self):
+        super().setUp()
+        self.genre = Genre.objects.create(genre_id=28, name='Action')
+        self.actor = Actor.objects.create(name='Tom Hanks')
+        self.director = Director.objects.create(director_id='nm0000229', name='Steven Spielberg')
+        # Create a handful of fully related movies so per-movie queries would show up.
+        for tmdb_id in range(1, 6):
+            self._create_movie(tmdb_id)
+
+    def _create_movie(self, tmdb_id):
+        return make_movie(
+            tmdb_id, genres=[self.genre], casts=[self.actor, Actor.objects.create(name=f"Extra {tmdb_id}")],
+            directors=[self.director], vote_average=5 + tmdb_id / 10, vote_count=100 * tmdb_id, runtime=100,
+            revenue=1000000 * tmdb_id, budget=100000, overview="Overview.",
+        )
+
+    def assertConstantQueries(self, url, num):
+        # The query count must not change when more movies match the request. Both
+        # requests follow writes, so both read the new dataset state.
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for tmdb_id in range(6, 11):
+            self._create_movie(tmdb_id)
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_movie_detail_queries(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('movie-detail', kwargs={'id': 1}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['casts'], ['Tom Hanks', 'Extra 1'])
+
+    def test_movie_detail_by_imdb_id(self):
+        """ Test that IMDb IDs resolve through the same detail route. """
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('movie-detail', kwargs={'id': 'tt0000002'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Movie 2')
+
+    def test_movie_detail_misses_are_cached(self):
+        """ Test that repeated lookups of a missing movie skip the database until it is created. """
+        url = reverse('movie-detail', kwargs={'id': 42})
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self._create_movie(42)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_movies_by_actor_queries(self):
+        self.assertConstantQueries(reverse('movies-by-actor', kwargs={'actor_name': 'tom_hanks'}), 5)
+
+    def test_movies_by_genre_queries(self):
+        self.assertConstantQueries(reverse('movies-by-genre', kwargs={'genre_name': 'action'}), 5)
+
+    def test_movies_by_director_queries(self):
+        self.assertConstantQueries(reverse('movies-by-director', kwargs={'director_name': 'steven_spielberg'}), 5)
+
+    def test_top_rated_movies_queries(self):
+        self.assertConstantQueries(reverse('top-rated-movies', kwargs={'top_n': 100}), 5)
+
+    def test_best_roi_movies_queries(self):
+        self.assertConstantQueries(reverse('best-roi-movies', kwargs={'top_n': 100}), 5)
+
+    def test_top_rated_movies_are_ranked(self):
+        """ Test that top-rated movies carry their 1-based rank. """
+        response = self.client.get(reverse('top-rated-movies', kwargs={'top_n': 3}))
+        self.assertEqual([item['index'] for item in response.data], [1, 2, 3])
+        self.assertEqual([item['title'] for item in response.data], ['Movie 5', 'Movie 4', 'Movie 3'])
+
+    def test_movies_by_genre_ranks_continue_across_pages(self):
+        """ Test that genre ranks on later pages start after the previous page. """
+        for tmdb_id in range(6, 13):
+            self._create_movie(tmdb_id)
+        first_page = self.client.get(reverse('movies-by-genre', kwargs={'genre_name': 'action'}))
+        response = self.client.get(first_page.data['next'])
+        self.assertEqual([item['index'] for item in response.data['results']], [11, 12])
+        self.assertIsNone(response.data['next'])
+
+    def test_keyset_pages_walk_the_whole_listing(self):
+        """ Test that following cursors visits every movie once, in order, including ties. """
+        for tmdb_id in range(6, 13):
+            movie = self._create_movie(tmdb_id)
+            movie.vote_average = 9.0
+            movie.save()
+        url = reverse('movies-by-actor', kwargs={'actor_name': 'tom_hanks'})
+        titles, ranks = [], []
+        response = self.client.get(url, {'page_size': 3})
+        while True:
+            titles += [item['title'] for item in response.data['results']]
+            ranks += [item['index'] for item in response.data['results']]
+            if response.data['next'] is None:
+                break
+            # Deep pages cost the same fixed number of queries as the first one.
+            with self.assertNumQueries(4):
+                response = self.client.get(response.data['next'])
+        expected = [f"Movie {tmdb_id}" for tmdb_id in [6, 7, 8, 9, 10, 11, 12, 5, 4, 3, 2, 1]]
+        self.assertEqual(titles, expected)
+        self.assertEqual(ranks, list(range(1, 13)))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('movies-by-actor', kwargs={'actor_name': 'tom_hanks'}), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_is_rejected(self):
+        """ Test that cursor values of the wrong type are rejected before they reach the query. """
+        listings = [
+            (reverse('movies-by-actor', kwargs={'actor_name': 'tom_hanks'}), ['high', 1]),
+            (reverse('movies-by-director', kwargs={'director_name': 'steven_spielberg'}), [5.5, 'one']),
+            (reverse('movies-by-genre', kwargs={'genre_name': 'action'}), [[1]]),
+            (reverse('movies-by-genre', kwargs={'genre_name': 'action'}), [None]),
+        ]
+        for url, position in listings:
+            cursor = base64.urlsafe_b64encode(json.dumps([position, 0]).encode()).decode()
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_best_roi_movies_use_stored_roi(self):
+        """ Test that best-ROI ranking uses the stored ROI and handles zero budgets. """
+        movie = self._create_movie(20)
+        movie.budget = 0
+        movie.save()
+        self.assertEqual(Movies.objects.get(tmdb_id=20).roi, 0.0)
+        self.assertEqual(Movies.objects.get(tmdb_id=5).roi, 50.0)
+        response = self.client.get(reverse('best-roi-movies', kwargs={'top_n': 2}))
+        self.assertEqual([item['title'] for item in response.data], ['Movie 5', 'Movie 4'])
+        self.assertNotIn('roi', response.data[0])
+
+    def test_name_lookups_use_normalized_slug(self):
+        """ Test that mixed-case names match through their normalized slug. """
+        movie = Movies.objects.get(tmdb_id=1)
+        actor = Actor.objects.create(name='Matthew McConaughey')
+        genre = Genre.objects.create(genre_id=878, name='Science Fiction')
+        director = Director.objects.create(director_id='nm0634240', name='Christopher Nolan')
+        movie.casts.add(actor)
+        movie.genres.add(genre)
+        movie.directors.add(director)
+        self.assertEqual(actor.slug, 'matthew-mcconaughey')
+        urls = [
+            reverse('movies-by-actor', kwargs={'actor_name': 'matthew_mcconaughey'}),
+            reverse('movies-by-director', kwargs={'director_name': 'Christopher_Nolan'}),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual([item['title'] for item in response.data['results']], ['Movie 1'])
+        response = self.client.get(reverse('movies-by-genre', kwargs={'genre_name': 'science_fiction'}))
+        self.assertEqual([item['title'] for item in response.data['results']], ['Movie 1'])
+
+    def test_responses_are_cached_until_dataset_changes(self):
+        """ Test that repeated reads are served from the cache and invalidated by writes. """
+        reset_cache_stats()
+        url = reverse('top-rated-movies', kwargs={'top_n': 3})
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+        self._create_movie(99)
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]['title'], 'Movie 99')
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_dataset_version_is_shared_between_processes(self):
+        """ Test that a version moved on by another process invalidates this one's responses. """
+        url = reverse('top-rated-movies', kwargs={'top_n': 3})
+        first = self.client.get(url)
+        # An import or another worker bumps the stored version; this process keeps
+        # its copy of the state until it expires.
+        DatasetState.objects.update(version=F('version') + 1)
+        self.assertEqual(self.client.get(url)['ETag'], first['ETag'])
+        forget_dataset_state()
+        self.assertNotEqual(self.client.get(url)['ETag'], first['ETag'])
+
+    def test_cached_responses_are_keyed_on_query_params(self):
+        """ Test that different pages of the same listing are cached separately. """
+        for tmdb_id in range(6, 13):
+            self._create_movie(tmdb_id)
+        url = reverse('movies-by-genre', kwargs={'genre_name': 'action'})
+        first_page = self.client.get(url)
+        second_page = self.client.get(first_page.data['next'])
+        self.assertNotEqual(first_page.data['results'], second_page.data['results'])
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def movie_csv_row(tmdb_id, title, imdb_id, vote_average='7.5', budget='1000', revenue='5000'):
+    return [tmdb_id, title, imdb_id, vote_average, '100', 'en', '2001/02/03', '120', 'False',
+            revenue, budget, '', '', '', f"Overview of {title}."]
+
+# Write a small TMDB dump into directory, in the layout CatalogImporter reads.
+def write_catalog(directory, movies=None, casts=None, movie_genres=None):
+    movies = movies if movies is not None else [
+        movie_csv_row('1', 'First', 'tt0000001'),
+        movie_csv_row('2', 'Second', 'tt0000002', vote_average='8.1', budget='0'),
+        movie_csv_row('3', 'No IMDb', ''),
+    ]
+    casts = casts if casts is not None else [
+        ['1', 'Tom Hanks,Meg Ryan,Bill Pullman,Rosie O\'Donnell'],
+        ['2', 'Tom Hanks'],
+        ['3', 'Nobody'],
+    ]
+    movie_genres = movie_genres if movie_genres is not None else [['1', '35,10749'], ['2', '18']]
+    write_csv(os.path.join(directory, 'tmdb_9999_popular_movies_database.csv'), ['id'] * 15, movies)
+    write_csv(os.path.join(directory, 'tmdb_id_to_casts.csv'), ['tmdb_id', 'casts'], casts)
+    write_csv(os.path.join(directory, 'tmdb_id_to_genres.csv'), ['tmdb_id', 'genre_ids'], movie_genres)
+    write_csv(os.path.join(directory, 'genres_id.csv'), ['genre_id', 'name'],
+              [['35', 'Comedy'], ['10749', 'Romance'], ['18', 'Drama']])
+    write_csv(os.path.join(directory, 'directors_to_imdb_id.csv'),
+              ['director_id', 'name', 'birthYear', 'deathYear', 'primaryProfession', 'knownForTitles'],
+              [['nm0001', 'Nora Ephron', '1941', '2012', 'director', 'tt0000001,tt0099999'],
+               ['nm0002', 'Rob Reiner', '1947', '\\N', 'director', '']])
+
+class CatalogImporterTest(TestCase):
+    """ Test the bulk CSV importer """
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        write_catalog(self.data_dir)
+
+    def test_full_import(self):
+        stats = CatalogImporter(self.data_dir, progress=False).run()
+        self.assertEqual([stage.name for stage in stats], ['genres', 'movies', 'casts', 'directors', 'movie genres'])
+        self.assertEqual(sorted(Movies.objects.values_list('tmdb_id', flat=True)), [1, 2])
+        first = Movies.objects.get(tmdb_id=1)
+        self.assertEqual(first.release_date, datetime.date(2001, 2, 3))
+        self.assertEqual(first.roi, 5.0)
+        self.assertEqual(Movies.objects.get(tmdb_id=2).roi, 0.0)
+        self.assertEqual(sorted(first.casts.values_list('name', flat=True)), ['Bill Pullman', 'Meg Ryan', 'Tom Hanks'])
+        self.assertEqual(Actor.objects.filter(name='Tom Hanks').count(), 1)
+        self.assertEqual(Actor.objects.get(name='Tom Hanks').slug, 'tom-hanks')
+        self.assertEqual(sorted(first.genres.values_list('slug', flat=True)), ['comedy', 'romance'])
+        director = Director.objects.get(director_id='nm0001')
+        self.assertEqual(sorted(director.known_for_titles.values_list('imdb_id', flat=True)), ['tt0000001', 'tt0099999'])
+        self.assertIsNone(Director.objects.get(director_id='nm0002').death_year)
+
+    def test_import_uses_a_fixed_number_of_queries(self):
+        # Query count depends on the number of batches, not on the number of rows;
+        # re-ranking the leaderboards afterwards takes seven of them, and moving to
+        # a new dataset version one.
+        with self.assertNumQueries(32):
+            CatalogImporter(self.data_dir, progress=False).run()
+
+    def test_reimport_refreshes_existing_rows(self):
+        CatalogImporter(self.data_dir, progress=False).run()
+        CatalogImporter(self.data_dir, progress=False).run()
+        self.assertEqual(Movies.objects.count(), 2)
+        self.assertEqual(Movies.casts.through.objects.count(), 4)
+        self.assertEqual(Actor.objects.count(), 3)
+
+    def test_delta_import_only_writes_changed_rows(self):
+        CatalogImporter(self.data_dir, progress=False).run()
+        write_catalog(
+            self.data_dir,
+            movies=[
+                movie_csv_row('1', 'First', 'tt0000001'),
+                movie_csv_row('2', 'Second (Director\'s Cut)', 'tt0000002', vote_average='8.1', budget='0'),
+                movie_csv_row('4', 'Fourth', 'tt0000004'),
+            ],
+            casts=[['1', 'Tom Hanks,Meg Ryan,Bill Pullman'], ['2', 'Tom Hanks,Carrie Fisher'], ['4', 'Meg Ryan']],
+            movie_genres=[['1', '35,10749'], ['2', '18'], ['4', '35']],
+        )
+        stats = {stage.name: stage for stage in CatalogImporter(self.data_dir, delta=True, progress=False).run()}
+        self.assertEqual(stats['movies'].changed, 2)
+        self.assertEqual(stats['casts'].changed, 3)
+        self.assertEqual(stats['movie genres'].changed, 1)
+        self.assertEqual(stats['directors'].changed, 0)
+        self.assertEqual(Movies.objects.get(tmdb_id=2).title, "Second (Director's Cut)")
+        self.assertEqual(sorted(Movies.objects.get(tmdb_id=2).casts.values_list('name', flat=True)), ['Carrie Fisher', 'Tom Hanks'])
+        self.assertEqual(list(Movies.objects.get(tmdb_id=4).genres.values_list('name', flat=True)), ['Comedy'])
+        # The first movie's row changed (fewer listed actors) but its linked top-billed cast is the same.
+        self.assertEqual(Movies.objects.get(tmdb_id=1).casts.count(), 3)
+
+    def test_unchanged_delta_import_skips_writes(self):
+        CatalogImporter(self.data_dir, progress=False).run()
+        version = get_dataset_version()
+        stats = CatalogImporter(self.data_dir, delta=True, progress=False).run()
+        self.assertEqual({stage.name: stage.changed for stage in stats},
+                         {'genres': 0, 'movies': 0, 'casts': 0, 'directors': 0, 'movie genres': 0})
+        # Nothing changed, so cached responses stay valid.
+        self.assertEqual(get_dataset_version(), version)
+
+    def test_renamed_genre_counts_as_changed(self):
+        CatalogImporter(self.data_dir, progress=False).run()
+        write_csv(os.path.join(self.data_dir, 'genres_id.csv'), ['genre_id', 'name'],
+                  [['35', 'Comedy'], ['10749', 'Romance Movies'], ['18', 'Drama']])
+        stats = CatalogImporter(self.data_dir, delta=True, progress=False).run()
+        self.assertEqual(stats[0].changed, 1)
+        self.assertEqual(Genre.objects.get(genre_id=10749).slug, 'romance-movies')
+
+    def test_parallel_streaming_import_matches_serial_import(self):
+        # Small batches force several chunks through the process pool.
+        stats = CatalogImporter(self.data_dir, batch_size=1, workers=2, progress=False).run()
+        self.assertEqual({stage.name: stage.rows for stage in stats},
+                         {'genres': 3, 'movies': 3, 'casts': 3, 'directors': 2, 'movie genres': 2})
+        self.assertEqual(sorted(Movies.objects.values_list('tmdb_id', flat=True)), [1, 2])
+        self.assertEqual(Movies.casts.through.objects.count(), 4)
+        self.assertEqual(Movies.genres.through.objects.count(), 3)
+        self.assertEqual(Director.known_for_titles.through.objects.count(), 2)
+
+    def test_parallel_import_works_in_spawned_workers(self):
+        # Spawned workers (the default on macOS, and forkserver on Linux from Python
+        # 3.14) start a fresh interpreter and must set Django up before parsing.
+        spawn_pool = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        with mock.patch('tmdbData.importer.ProcessPoolExecutor', spawn_pool):
+            stats = CatalogImporter(self.data_dir, batch_size=1, workers=2, progress=False).run()
+        self.assertEqual({stage.name: stage.rows for stage in stats},
+                         {'genres': 3, 'movies': 3, 'casts': 3, 'directors': 2, 'movie genres': 2})
+        self.assertEqual(sorted(Movies.objects.values_list('tmdb_id', flat=True)), [1, 2])
+
+
+class ImportCommandTest(TestCase):
+    """ Test the import_tmdb management command """
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        write_catalog(self.data_dir)
+
+    def test_import_reports_stage_metrics(self):
+        out = io.StringIO()
+        call_command('import_tmdb', self.data_dir, '--workers=1', '--no-progress', stdout=out)
+        self.assertEqual(Movies.objects.count(), 2)
+        self.assertIn('movies: 3 rows (2 changed)', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('queries', out.getvalue())
+        # A completed import leaves nothing to resume.
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_failed_import_resumes_from_last_committed_batch(self):
+        original = CatalogImporter.actor_ids
+        calls = []
+
+        def fail_on_second_batch(importer, names):
+            calls.append(names)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return original(importer, names)
+
+        with mock.patch.object(CatalogImporter, 'actor_ids', fail_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                call_command('import_tmdb', self.data_dir, '--batch-size=1', '--workers=1', '--no-progress',
+                             stdout=io.StringIO())
+        # Movies are complete and the first cast batch is committed.
+        self.assertTrue(ImportCheckpoint.objects.get(stage='movies').completed)
+        self.assertEqual(ImportCheckpoint.objects.get(stage='casts').batches, 1)
+        self.assertEqual(Movies.casts.through.objects.count(), 3)
+
+        out = io.StringIO()
+        call_command('import_tmdb', self.data_dir, '--batch-size=1', '--workers=1', '--no-progress', '--resume',
+                     stdout=out)
+        self.assertIn('movies: 3 rows (2 changed), completed by a previous run', out.getvalue())
+        self.assertEqual(Movies.casts.through.objects.count(), 4)
+        self.assertEqual(Movies.genres.through.objects.count(), 3)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_crashed_worker_suggests_resuming(self):
+        with mock.patch.object(CatalogImporter, 'run', side_effect=BrokenProcessPool("worker died")):
+            with self.assertRaisesMessage(CommandError, "Re-run with --resume"):
+                call_command('import_tmdb', self.data_dir, '--workers=2', '--no-progress', stdout=io.StringIO())
+
+    def test_resume_requires_the_same_batch_size(self):
+        ImportCheckpoint.objects.create(stage='movies', batch_size=500, batches=2)
+        with self.assertRaises(CommandError):
+            call_command('import_tmdb', self.data_dir, '--resume', '--no-progress', stdout=io.StringIO())
+
+
+class TokenAuthenticationTest(TestCase):
+    """ Test the cached token authentication path """
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        verified_tokens.clear()
+        self.user = User.objects.create_user(username='reader', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('movie-detail', kwargs={'id': 1})
+
+    def test_obtain_token(self):
+        response = self.client.post(reverse('auth-token'), {'username': 'reader', 'password': 'secret'})
+        self.assertEqual(response.data['token'], self.token.key)
+
+    def test_verified_token_is_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # The first request looks the token and the dataset state up (then misses the movie).
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        # Repeated requests authenticate from memory and hit the negative lookup cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_token_stops_authenticating(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_stops_authenticating(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_basic_authentication_still_works(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Basic ' + base64.b64encode(b'reader:secret').decode())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StreamingResponseTest(AuthenticatedTestCase):
+    """ Test streamed top-N and export responses """
+
+    def setUp(self):
+        super().setUp()
+        genre = Genre.objects.create(genre_id=18, name='Drama')
+        for tmdb_id in range(1, 8):
+            make_movie(tmdb_id, genres=[genre], vote_average=tmdb_id, revenue=100 * tmdb_id)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_streamed_json_matches_regular_response(self):
+        url = reverse('top-rated-movies', kwargs={'top_n': 5})
+        regular = self.client.get(url).content.decode()
+        streamed = self.client.get(url, {'stream': 'json'})
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        self.assertEqual(self.read(streamed), regular)
+
+    @override_settings(TMDB_STREAM_CHUNK_SIZE=2)
+    def test_ndjson_stream_reads_in_chunks(self):
+        url = reverse('best-roi-movies', kwargs={'top_n': 100})
+        # The dataset state, one streamed movie query plus three prefetch queries
+        # per chunk of two movies.
+        with self.assertNumQueries(14):
+            lines = self.read(self.client.get(url, HTTP_ACCEPT='application/x-ndjson')).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['index'] for row in rows], list(range(1, 8)))
+        self.assertEqual(rows[0]['title'], 'Movie 7')
+        self.assertEqual(rows[0]['genres'], ['Drama'])
+
+    @override_settings(TMDB_STREAM_THRESHOLD=3)
+    def test_large_top_n_is_streamed(self):
+        response = self.client.get(reverse('top-rated-movies', kwargs={'top_n': 4}))
+        self.assertEqual(len(json.loads(self.read(response))), 4)
+
+    def test_export_streams_full_catalog(self):
+        lines = self.read(self.client.get(reverse('movie-export'))).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], [f"Movie {n}" for n in range(1, 8)])
+
+
+# Reference output of the movie endpoints, produced by MovieSerializer.
+GOLDEN_MOVIES_PATH = os.path.join(os.path.dirname(__file__), 'testdata', 'golden_movies.json')
+
+class LeanRepresentationTest(AuthenticatedTestCase):
+    """ Test that the lean read path matches MovieSerializer output exactly """
+
+    def setUp(self):
+        super().setUp()
+        drama = Genre.objects.create(genre_id=18, name='Drama')
+        action = Genre.objects.create(genre_id=28, name='Action')
+        spielberg = Director.objects.create(director_id='nm0000229', name='Steven Spielberg')
+        kurosawa = Director.objects.create(director_id='nm0000041', name='Akira Kurosawa')
+        hanks = Actor.objects.create(name='Tom Hanks')
+        mifune = Actor.objects.create(name='Toshirō Mifune')
+        schindler = Movies.objects.create(
+            tmdb_id=424, title="Schindler's List", imdb_id=IMDBEntry.objects.create(imdb_id='tt0108052'),
+            vote_average=8.573, vote_count=14594, release_date='1993-12-15', runtime=195, adult=False,
+            revenue=321365567, budget=22000000, overview="The true story of Oskar Schindler.",
+        )
+        # Relations are added out of primary key order; both paths list them by primary key.
+        schindler.genres.add(action, drama)
+        schindler.casts.add(mifune, hanks)
+        schindler.directors.add(spielberg, kurosawa)
+        seven_samurai = Movies.objects.create(
+            tmdb_id=346, title='七人の侍', imdb_id=IMDBEntry.objects.create(imdb_id='tt0047478'),
+            vote_average=8.5, vote_count=3400, release_date='1954-04-26', runtime=207, adult=False,
+            revenue=271841, budget=2000000, overview='',
+        )
+        seven_samurai.genres.add(drama)
+        seven_samurai.casts.add(mifune)
+        seven_samurai.directors.add(kurosawa)
+        Movies.objects.create(
+            tmdb_id=5, title='Four Rooms', imdb_id=IMDBEntry.objects.create(imdb_id='tt0113101'),
+            vote_average=6, vote_count=2, release_date='1995-12-09', runtime=98, adult=True,
+            revenue=0, budget=0, overview='Without relations.',
+        )
+        with open(GOLDEN_MOVIES_PATH, encoding='utf-8') as golden:
+            self.golden = json.load(golden)
+
+    def test_golden_file_matches_movie_serializer(self):
+        movies = list(Movies.objects.with_relations().order_by('-vote_average', 'tmdb_id'))
+        data = MovieSerializer(movies, many=True, context={'ranks': rank_map(movies)}).data
+        self.assertEqual(json.loads(json.dumps(data)), self.golden)
+
+    def test_lean_representation_matches_golden_file(self):
+        rows = movie_values(Movies.objects.order_by('-vote_average', 'tmdb_id'))
+        data = represent_movies(rows, start_rank=1)
+        self.assertEqual(data, self.golden)
+        # Key order is part of the rendered output too.
+        self.assertEqual([list(movie) for movie in data], [list(movie) for movie in self.golden])
+
+    def test_endpoints_render_golden_output(self):
+        response = self.client.get(reverse('top-rated-movies', kwargs={'top_n': 3}))
+        self.assertEqual(response.json(), self.golden)
+        response = self.client.get(reverse('movie-detail', kwargs={'id': 346}))
+        self.assertEqual(response.json(), dict(self.golden[1], index=None))
+        response = self.client.get(reverse('movies-by-genre', kwargs={'genre_name': 'Drama'}))
+        self.assertEqual(response.json()['results'], self.golden[:2])
+
+class MovieBatchTest(AuthenticatedTestCase):
+    """ Test the batch movie lookup endpoint """
+
+    def setUp(self):
+        super().setUp()
+        genre = Genre.objects.create(genre_id=18, name='Drama')
+        for tmdb_id in range(1, 31):
+            make_movie(tmdb_id, genres=[genre])
+        self.url = reverse('movie-batch')
+
+    def test_results_follow_request_order(self):
+        # The dataset state, two IN queries (TMDB and IMDb IDs) and three relation
+        # queries, however many IDs.
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url, {'ids': '3,tt0000001,999,tt9999999,3'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['id'] for result in results], [3, 'tt0000001', 999, 'tt9999999', 3])
+        self.assertEqual([result['found'] for result in results], [True, True, False, False, True])
+        self.assertEqual(results[1]['movie']['title'], 'Movie 1')
+        self.assertEqual(results[1]['movie']['genres'], ['Drama'])
+        self.assertIsNone(results[2]['movie'])
+        detail = self.client.get(reverse('movie-detail', kwargs={'id': 3}))
+        self.assertEqual(results[0]['movie'], detail.data)
+
+    def test_query_count_does_not_grow_with_ids(self):
+        ids = [str(tmdb_id) for tmdb_id in range(1, 31)] + [f'tt{tmdb_id:07d}' for tmdb_id in range(1, 31)]
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url, {'ids': ids})
+        self.assertTrue(all(result['found'] for result in response.data['results']))
+
+    @override_settings(TMDB_BATCH_MAX_IDS=2)
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,2,3'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'ids': '1,abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Invalid movie IDs: abc.')
+
+class MovieBulkCreateTest(AuthenticatedTestCase):
+    """ Test the bulk movie creation endpoint """
+
+    def setUp(self):
+        super().setUp()
+        Genre.objects.create(genre_id=28, name='Action')
+        Actor.objects.create(name='Tom Hanks')
+        Director.objects.create(director_id='nm0000229', name='Steven Spielberg')
+        self.url = reverse('bulk-create-movies')
+
+    def movie_data(self, tmdb_id, casts):
+        return {
+            "tmdb_id": tmdb_id, "title": f"Movie {tmdb_id}", "release_date": "2024-01-01", "vote_average": 7.5,
+            "vote_count": 100, "overview": "Overview.", "runtime": 120, "adult": False, "revenue": 3000,
+            "budget": 1000, "imdb_id": f"tt{tmdb_id:07d}", "genres": ["Action", "Drama"],
+            "casts": casts, "directors": ["Steven Spielberg", "New Director"],
+        }
+
+    def post(self, movies):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, movies, format='json')
+
+    def test_bulk_create_resolves_and_creates_relations(self):
+        movies = [self.movie_data(2, ['Tom Hanks', 'New Actor']), self.movie_data(1, ['New Actor'])]
+        response = self.post(movies)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([movie['tmdb_id'] for movie in response.data], [2, 1])
+        self.assertEqual(response.data[0]['casts'], ['Tom Hanks', 'New Actor'])
+        self.assertEqual(response.data[0]['genres'], ['Action', 'Drama'])
+        self.assertCountEqual(response.data[1]['directors'], ['Steven Spielberg', 'New Director'])
+        # Missing entities are created once and shared by both movies.
+        self.assertEqual(Actor.objects.filter(name='New Actor').count(), 1)
+        self.assertEqual(Genre.objects.get(name='Drama').slug, 'drama')
+        self.assertEqual(Director.objects.filter(name='New Director').count(), 1)
+        self.assertEqual(Movies.objects.get(tmdb_id=1).roi, 3.0)
+        detail = self.client.get(reverse('movie-detail', kwargs={'id': 2}))
+        self.assertEqual(detail.data, response.data[0])
+
+    def test_query_count_does_not_grow_with_relations(self):
+        # The first request also creates the 'Drama' genre and 'New Director'.
+        self.post([self.movie_data(1, [])])
+        small = [self.movie_data(2, ['Actor 1'])]
+        large = [self.movie_data(tmdb_id, [f'Actor {n}' for n in range(2, 22)]) for tmdb_id in range(3, 13)]
+        # Seventeen queries for the movies, three for each of the four leaderboards
+        # they join and one for moving to a new dataset version.
+        with self.assertNumQueries(30):
+            self.post(small)
+        with self.assertNumQueries(30):
+            response = self.post(large)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data[9]['casts']), 20)
+
+    def test_names_resolve_on_their_slugs(self):
+        movie = dict(self.movie_data(1, ['tom hanks', 'TOM HANKS']), genres=['action', 'ACTION'],
+                     directors=['steven spielberg', 'New Director', 'new director'])
+        response = self.post([movie])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]['genres'], ['Action'])
+        self.assertEqual(response.data[0]['casts'], ['Tom Hanks'])
+        self.assertCountEqual(response.data[0]['directors'], ['Steven Spielberg', 'New Director'])
+        self.assertEqual(Genre.objects.count(), 1)
+        self.assertEqual(Actor.objects.count(), 1)
+        self.assertEqual(Director.objects.count(), 2)
+        listing = self.client.get(reverse('movies-by-genre', kwargs={'genre_name': 'action'}))
+        self.assertEqual([movie['tmdb_id'] for movie in listing.data['results']], [1])
+
+    def test_invalid_requests_create_nothing(self):
+        self.post([self.movie_data(1, [])])
+        response = self.post([self.movie_data(2, []), self.movie_data(1, [])])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post([self.movie_data(3, []), self.movie_data(3, [])])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        invalid = dict(self.movie_data(4, []), imdb_id='4')
+        response = self.post([self.movie_data(5, []), invalid])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('imdb_id', response.data[1])
+        self.assertEqual(list(Movies.objects.values_list('tmdb_id', flat=True)), [1])
+
+    def test_bulk_create_bumps_dataset_version(self):
+        url = reverse('movies-by-genre', kwargs={'genre_name': 'action'})
+        self.assertEqual(self.client.get(url).data['results'], [])
+        self.post([self.movie_data(1, [])])
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+
+class LeaderboardTest(AuthenticatedTestCase):
+    """ Test that the precomputed leaderboards follow movie writes """
+
+    def setUp(self):
+        super().setUp()
+        self.drama = Genre.objects.create(genre_id=18, name='Drama')
+        self.action = Genre.objects.create(genre_id=28, name='Action')
+        for tmdb_id, vote_average, revenue in [(1, 6.0, 500), (2, 8.0, 100), (3, 7.0, 900), (4, 8.0, 300)]:
+            genres = [self.drama] if tmdb_id % 2 else [self.drama, self.action]
+            make_movie(tmdb_id, genres=genres, vote_average=vote_average, revenue=revenue, budget=100)
+
+    # board -> tmdb_ids in rank order, checking that ranks are 1..n without gaps.
+    def boards(self):
+        boards = {}
+        for board, rank, movie_id in LeaderboardEntry.objects.order_by('board', 'rank').values_list('board', 'rank', 'movie_id'):
+            boards.setdefault(board, []).append(movie_id)
+            self.assertEqual(rank, len(boards[board]))
+        return boards
+
+    def assertMatchesRebuild(self):
+        incremental = self.boards()
+        rebuild_leaderboards()
+        self.assertEqual(incremental, self.boards())
+        return incremental
+
+    def test_boards_rank_movies(self):
+        self.assertEqual(self.assertMatchesRebuild(), {
+            'top-rated': [2, 4, 3, 1],
+            'best-roi': [3, 1, 4, 2],
+            'genre:drama': [2, 4, 3, 1],
+            'genre:action': [2, 4],
+        })
+
+    def test_incremental_updates_match_rebuild(self):
+        movie = make_movie(5, genres=[self.action], vote_average=7.5, revenue=1000, budget=100)
+        movie.vote_average = 9.0
+        movie.save()
+        movie.genres.set([self.drama])
+        Movies.objects.get(tmdb_id=2).delete()
+        self.action.movies_set.add(Movies.objects.get(tmdb_id=1))
+        boards = self.assertMatchesRebuild()
+        self.assertEqual(boards['top-rated'], [5, 4, 3, 1])
+        self.assertEqual(boards['genre:action'], [4, 1])
+
+    def test_bulk_created_movies_are_placed_on_boards(self):
+        movies = [
+            {"tmdb_id": tmdb_id, "title": f"Movie {tmdb_id}", "release_date": "2024-01-01", "vote_average": vote_average,
+             "vote_count": 10, "overview": "", "runtime": 90, "adult": False, "revenue": revenue, "budget": 100,
+             "imdb_id": f"tt{tmdb_id:07d}", "genres": genres}
+            for tmdb_id, vote_average, revenue, genres in [
+                (9, 8.0, 50, ['Drama']), (5, 9.5, 400, ['action']), (7, 1.0, 2000, ['Drama', 'Western']),
+                (8, 8.0, 900, []), (6, 8.0, 300, ['Drama']),
+            ]
+        ]
+        response = self.client.post(reverse('bulk-create-movies'), movies, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        boards = self.assertMatchesRebuild()
+        self.assertEqual(boards['top-rated'], [5, 2, 4, 6, 8, 9, 3, 1, 7])
+        self.assertEqual(boards['genre:action'], [5, 2, 4])
+        self.assertEqual(boards['genre:western'], [7])
+
+    def test_top_n_reads_a_prefix_of_the_board(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('top-rated-movies', kwargs={'top_n': 3}))
+        self.assertEqual([(movie['tmdb_id'], movie['index']) for movie in response.data], [(2, 1), (4, 2), (3, 3)])
+        response = self.client.get(reverse('best-roi-movies', kwargs={'top_n': 2}))
+        self.assertEqual([movie['tmdb_id'] for movie in response.data], [3, 1])
+
+    def test_genre_listing_pages_walk_the_board(self):
+        url = reverse('movies-by-genre', kwargs={'genre_name': 'drama'})
+        response = self.client.get(url, {'page_size': 3})
+        self.assertEqual([movie['index'] for movie in response.data['results']], [1, 2, 3])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([(movie['tmdb_id'], movie['index']) for movie in response.data['results']], [(1, 4)])
+
+    def test_import_rebuilds_boards(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        write_catalog(directory)
+        CatalogImporter(directory, progress=False).run()
+        self.assertMatchesRebuild()
+
+class CatalogSnapshotTest(AuthenticatedTestCase):
+    """ Test that the in-memory catalog snapshot answers like the database """
+
+    def setUp(self):
+        super().setUp()
+        drama = Genre.objects.create(genre_id=18, name='Drama')
+        actor = Actor.objects.create(name='Tom Hanks')
+        director = Director.objects.create(director_id='nm0000229', name='Steven Spielberg')
+        for tmdb_id in range(1, 13):
+            make_movie(
+                tmdb_id, genres=[drama], casts=[actor, Actor.objects.create(name=f"Extra {tmdb_id}")],
+                directors=[director] if tmdb_id % 2 else [], vote_average=tmdb_id % 4,
+                revenue=100 * (tmdb_id % 5), budget=10 if tmdb_id % 3 else 0,
+            )
+
+    # Every page of a listing, following cursors.
+    def walk(self, url):
+        pages = []
+        response = self.client.get(url, {'page_size': 5})
+        while True:
+            pages.append(response.json())
+            if response.data['next'] is None:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def responses(self):
+        responses = [self.walk(reverse(name, kwargs=kwargs)) for name, kwargs in [
+            ('movies-by-genre', {'genre_name': 'drama'}),
+            ('movies-by-actor', {'actor_name': 'tom_hanks'}),
+            ('movies-by-director', {'director_name': 'Steven Spielberg'}),
+            ('movies-by-actor', {'actor_name': 'nobody'}),
+        ]]
+        for name in ('top-rated-movies', 'best-roi-movies'):
+            responses.append(self.client.get(reverse(name, kwargs={'top_n': 8})).json())
+        # Start the next round with no cached responses.
+        bump_dataset_version()
+        return responses
+
+    def test_snapshot_matches_database(self):
+        expected = self.responses()
+        with override_settings(TMDB_SNAPSHOT_ENABLED=True):
+            self.assertEqual(self.responses(), expected)
+
+    @override_settings(TMDB_SNAPSHOT_ENABLED=True)
+    def test_listings_are_answered_from_memory(self):
+        self.client.get(reverse('top-rated-movies', kwargs={'top_n': 1}))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('movies-by-genre', kwargs={'genre_name': 'drama'}), {'page_size': 3})
+        self.assertEqual([movie['tmdb_id'] for movie in response.data['results']], [3, 7, 11])
+        with self.assertNumQueries(0):
+            response = self.client.get(response.data['next'])
+        self.assertEqual([movie['index'] for movie in response.data['results']], [4, 5, 6])
+
+    @override_settings(TMDB_SNAPSHOT_ENABLED=True)
+    def test_snapshot_is_replaced_when_dataset_changes(self):
+        url = reverse('top-rated-movies', kwargs={'top_n': 1})
+        self.assertEqual(self.client.get(url).data[0]['tmdb_id'], 3)
+        make_movie(99, title="New", vote_average=9.5, vote_count=1, revenue=1, budget=1)
+        self.assertEqual(self.client.get(url).data[0]['tmdb_id'], 99)
+
+    @override_settings(TMDB_SNAPSHOT_ENABLED=True)
+    def test_invalid_cursor_is_rejected(self):
+        url = reverse('movies-by-actor', kwargs={'actor_name': 'tom_hanks'})
+        cursor = base64.urlsafe_b64encode(json.dumps([['a', 'b'], 0]).encode()).decode()
+        self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, status.HTTP_404_NOT_FOUND)
+
+class MovieSearchTest(AuthenticatedTestCase):
+    """ Test the multi-criteria movie search endpoint """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('movie-search')
+        drama = Genre.objects.create(genre_id=18, name='Drama')
+        comedy = Genre.objects.create(genre_id=35, name='Comedy')
+        actor = Actor.objects.create(name='Tom Hanks')
+        director = Director.objects.create(director_id='nm0000229', name='Steven Spielberg')
+        for tmdb_id in range(1, 11):
+            make_movie(
+                tmdb_id, genres=[drama if tmdb_id % 2 else comedy], casts=[actor] if tmdb_id <= 6 else [],
+                directors=[director] if tmdb_id % 3 == 0 else [], vote_average=tmdb_id % 4,
+                vote_count=100 * tmdb_id, release_date=f'{1995 + tmdb_id}-06-01', runtime=80 + 5 * tmdb_id,
+                adult=tmdb_id == 10, revenue=100 * (tmdb_id % 5),
+            )
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [movie['tmdb_id'] for movie in response.data['results']]
+
+    def test_filters_are_combined(self):
+        self.assertEqual(self.search(genre='drama', actor='tom_hanks'), [3, 1, 5])
+        self.assertEqual(self.search(director='Steven Spielberg', year_from=2000), [6, 9])
+        self.assertEqual(self.search(year_from=1998, year_to=2000, sort='release_date'), [3, 4, 5])
+        self.assertEqual(self.search(runtime_min=100, runtime_max=110, sort='-runtime'), [6, 5, 4])
+        self.assertEqual(self.search(min_votes=800, sort='-vote_count'), [10, 9, 8])
+        self.assertEqual(self.search(adult='true'), [10])
+        self.assertEqual(self.search(adult='false', sort='-roi', min_votes=500), [9, 8, 7, 6, 5])
+
+    def test_pages_follow_date_cursor(self):
+        response = self.client.get(self.url, {'sort': '-release_date', 'page_size': 4})
+        ids, ranks = [], []
+        while True:
+            ids += [movie['tmdb_id'] for movie in response.data['results']]
+            ranks += [movie['index'] for movie in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, list(range(10, 0, -1)))
+        self.assertEqual(ranks, list(range(1, 11)))
+
+    def test_tampered_date_cursor_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(json.dumps([['2001-13-45', 3], 2]).encode()).decode()
+        response = self.client.get(self.url, {'sort': '-release_date', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'sort': 'title'}, {'year_from': 'soon'}, {'year_from': 2005, 'year_to': 2000},
+                       {'runtime_min': -1}, {'adult': 'maybe'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_adult_roi_search_uses_composite_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search(adult='false', sort='-roi')
+        sql = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('movies_adult_roi_idx', plan)
+
+class RequestMetricsTest(TestCase):
+    """ Test the request timing middleware and the metrics endpoint """
+
+    def setUp(self):
+        cache.clear()
+        verified_tokens.clear()
+        registry.reset()
+        self.token = Token.objects.create(user=User.objects.create_user(username='tester', password='secret'))
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        make_movie(1, genres=[Genre.objects.create(genre_id=18, name='Drama')], vote_average=7)
+
+    # Server-Timing metrics of a response: name -> (milliseconds, description).
+    def server_timing(self, response):
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            params = dict(param.split('=', 1) for param in params)
+            metrics[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+        return metrics
+
+    def test_response_reports_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movie-detail', kwargs={'id': 1}), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'total', 'db', 'auth', 'serialize'})
+        self.assertEqual(timing['db'][1], f'{len(queries)} queries')
+        self.assertGreater(timing['auth'][0], 0)
+        self.assertGreater(timing['serialize'][0], 0)
+        self.assertGreaterEqual(timing['total'][0], timing['db'][0] + timing['auth'][0])
+
+    def test_asgi_requests_are_timed(self):
+        async def request():
+            return await self.async_client.get(reverse('movie-detail', kwargs={'id': 1}),
+                                               headers={'Authorization': f'Token {self.token.key}'})
+        response = async_to_sync(request)()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = self.server_timing(response)
+        self.assertNotEqual(timing['db'][1], '0 queries')
+        self.assertGreater(timing['serialize'][0], 0)
+
+    def test_metrics_endpoint_exposes_histograms(self):
+        for _ in range(3):
+            self.client.get(reverse('movies-by-genre', kwargs={'genre_name': 'drama'}), **self.headers)
+        self.client.get('/no/such/page/')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE tmdb_request_duration_seconds histogram', text)
+        self.assertIn('tmdb_request_duration_seconds_count{view="movies-by-genre",phase="total"} 3', text)
+        self.assertIn('tmdb_request_duration_seconds_bucket{view="movies-by-genre",phase="db",le="+Inf"} 3', text)
+        self.assertIn('tmdb_request_queries_count{view="movies-by-genre"} 3', text)
+        self.assertIn('tmdb_request_duration_seconds_count{view="unmatched",phase="total"} 1', text)
+
+class ConditionalRequestTest(AuthenticatedTestCase):
+    """ Test ETag / Last-Modified validation of the read endpoints """
+
+    def setUp(self):
+        super().setUp()
+        genre = Genre.objects.create(genre_id=28, name='Action')
+        for tmdb_id in range(1, 4):
+            make_movie(tmdb_id, genres=[genre], vote_average=tmdb_id)
+
+    def test_unchanged_data_is_not_sent_again(self):
+        reset_cache_stats()
+        url = reverse('top-rated-movies', kwargs={'top_n': 2})
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], first['ETag'])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cache_stats()['not_modified'], 2)
+
+    def test_etag_changes_with_dataset_and_representation(self):
+        url = reverse('movies-by-genre', kwargs={'genre_name': 'action'})
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'page_size': 1})['ETag'], etag)
+        top_rated = reverse('top-rated-movies', kwargs={'top_n': 2})
+        self.assertNotEqual(self.client.get(top_rated, HTTP_ACCEPT='application/x-ndjson')['ETag'],
+                            self.client.get(top_rated)['ETag'])
+        make_movie(4, genres=[Genre.objects.get(genre_id=28)], vote_average=4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['tmdb_id'], 4)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_do_not_bypass_authentication(self):
+        url = reverse('top-rated-movies', kwargs={'top_n': 2})
+        etag = self.client.get(url)['ETag']
+        response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class FullTextSearchTest(AuthenticatedTestCase):
+    """ Test full-text search of titles and overviews """
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('movie-search')
+        drama = Genre.objects.create(genre_id=18, name='Drama')
+        movies = [
+            (1, "The Matrix", "A hacker learns the truth about reality.", 8.2),
+            (2, "Matrix Reloaded", "Neo fights the machines again.", 7.0),
+            (3, "Reality Bites", "Friends after college, living in a matrix of jobs.", 6.6),
+            (4, "Café Society", "A young man moves to Hollywood.", 6.5),
+            (5, "Star Wars", "A farm boy joins the rebellion.", 8.6),
+            (6, "Stardust", "A young man enters a magical realm.", 7.1),
+        ]
+        for tmdb_id, title, overview, vote_average in movies:
+            make_movie(tmdb_id, genres=[drama] if tmdb_id % 2 else [], title=title, overview=overview,
+                       vote_average=vote_average)
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [movie['tmdb_id'] for movie in response.data['results']]
+
+    def test_results_are_ranked_by_relevance(self):
+        # Title matches rank above overview matches.
+        ids = self.search(q='matrix')
+        self.assertCountEqual(ids[:2], [1, 2])
+        self.assertEqual(ids[2], 3)
+        self.assertEqual(self.search(q='matrix reloaded'), [2])
+        self.assertEqual(self.search(q='cafe'), [4])
+        self.assertCountEqual(self.search(q='young man'), [6, 4])
+
+    def test_prefix_queries_autocomplete(self):
+        self.assertEqual(self.search(q='sta'), [])
+        self.assertEqual(self.search(q='sta*'), [5, 6])
+        self.assertEqual(self.search(q='star wa*'), [5])
+
+    def test_search_text_combines_with_filters_and_sort(self):
+        self.assertEqual(self.search(q='matrix', genre='drama'), [1, 3])
+        self.assertEqual(self.search(q='matrix', sort='-vote_average'), [1, 2, 3])
+        self.assertEqual(self.search(q='matrix', sort='vote_average'), [3, 2, 1])
+
+    def test_relevance_pages_follow_cursor(self):
+        response = self.client.get(self.url, {'q': 'a*', 'page_size': 2})
+        ids, ranks = [], []
+        while True:
+            ids += [movie['tmdb_id'] for movie in response.data['results']]
+            ranks += [movie['index'] for movie in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertCountEqual(ids, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(ranks, [1, 2, 3, 4, 5, 6])
+
+    def test_filtered_relevance_pages_follow_cursor(self):
+        response = self.client.get(self.url, {'q': 'a*', 'genre': 'drama', 'page_size': 1})
+        ids = []
+        while True:
+            ids += [movie['tmdb_id'] for movie in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertCountEqual(ids, [1, 3, 5])
+
+    def test_tampered_relevance_cursor_is_rejected(self):
+        for position in (['best', 1], [1.5, 'one'], [None, 1], [[1], 1], [1.5]):
+            cursor = base64.urlsafe_b64encode(json.dumps([position, 0]).encode()).decode()
+            response = self.client.get(self.url, {'q': 'matrix', 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_index_follows_writes(self):
+        movie = Movies.objects.get(tmdb_id=4)
+        movie.title = "Blue Jasmine"
+        movie.save()
+        self.assertEqual(self.search(q='jasmine'), [4])
+        self.assertEqual(self.search(q='cafe'), [])
+        movie.delete()
+        self.assertEqual(self.search(q='jasmine'), [])
+
+    def test_search_text_cannot_inject_operators(self):
+        self.assertEqual(self.search(q='matrix OR star'), [])
+        self.assertCountEqual(self.search(q='matrix)" -(^'), [1, 2, 3])
+        response = self.client.get(self.url, {'q': '*** ""'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_relevance_page_uses_a_fixed_number_of_queries(self):
+        # The dataset state, the match query, the movies of the page and one query per relation.
+        with self.assertNumQueries(6):
+            self.search(q='a*')
+
+    def test_falls_back_to_icontains_without_index(self):
+        with mock.patch('tmdbData.search.fts_available', return_value=False), \
+                mock.patch('tmdbData.views.fts_available', return_value=False):
+            self.assertEqual(self.search(q='matrix'), [1, 2, 3])
+            self.assertEqual(self.search(q='young man'), [6, 4])
+
+class SimilarMoviesTest(AuthenticatedTestCase):
+    """ Test the similar movies endpoint """
+
+    def setUp(self):
+        super().setUp()
+        self.drama = Genre.objects.create(genre_id=18, name='Drama')
+        self.comedy = Genre.objects.create(genre_id=35, name='Comedy')
+        self.actor = Actor.objects.create(name='Tom Hanks')
+        self.director = Director.objects.create(director_id='nm0000229', name='Steven Spielberg')
+        make_movie(1, vote_average=8.0, genres=[self.drama], casts=[self.actor], directors=[self.director])
+        make_movie(2, vote_average=6.0, genres=[self.drama], casts=[self.actor], directors=[self.director])
+        make_movie(3, vote_average=8.0, genres=[self.drama])
+        make_movie(4, vote_average=7.0, genres=[self.comedy], casts=[self.actor])
+        make_movie(5, vote_average=8.0, genres=[self.comedy])
+        make_movie(6, vote_average=7.5, genres=[self.drama])
+
+    def similar(self, movie_id, **params):
+        response = self.client.get(reverse('similar-movies', kwargs={'id': movie_id}), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [movie['tmdb_id'] for movie in response.data]
+
+    def test_movies_are_ranked_by_shared_features_and_votes(self):
+        # Director, actor and genre shared beat actor alone, which beats a genre;
+        # among genre-only matches the closer vote average wins.
+        self.assertEqual(self.similar(1), [2, 4, 3, 6])
+        self.assertEqual(self.similar(1, k=2), [2, 4])
+        self.assertEqual(self.similar('tt0000005'), [4])
+        response = self.client.get(reverse('similar-movies', kwargs={'id': 1}))
+        self.assertEqual([movie['index'] for movie in response.data], [1, 2, 3, 4])
+        self.assertEqual(response.data[0]['directors'], ['Steven Spielberg'])
+
+    def test_unknown_movie_and_invalid_k(self):
+        response = self.client.get(reverse('similar-movies', kwargs={'id': 99}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for k in ('0', '101', 'ten'):
+            response = self.client.get(reverse('similar-movies', kwargs={'id': 1}), {'k': k})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_is_rebuilt_when_dataset_changes(self):
+        self.assertEqual(self.similar(4), [1, 2, 5])
+        make_movie(7, vote_average=7.0, genres=[self.comedy], casts=[self.actor])
+        self.assertEqual(self.similar(4), [7, 1, 2, 5])
+
+    def test_lookup_runs_no_feature_queries(self):
+        self.similar(2)
+        # The movies of the result and one query per relation; scoring is in memory.
+        with self.assertNumQueries(4):
+            self.similar(1)
+
+    @unittest.skipIf(similarity.sparse is None, 'scipy is not installed')
+    def test_sparse_and_pure_python_indexes_agree(self):
+        index = similarity.SimilarityIndex.load(0)
+        with mock.patch.object(similarity, 'sparse', None):
+            pure_index = similarity.SimilarityIndex.load(0)
+        for movie_id in range(1, 7):
+            self.assertEqual(index.similar(movie_id, 10), pure_index.similar(movie_id, 10))
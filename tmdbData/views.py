@@ -1,109 +1,298 @@
 from .models import *
 from .serializers import *
+import datetime
+from django.conf import settings
+from django.db.models import Value
+from .cache import cache_response, cache_stats, is_known_missing, remember_missing
+from .converters import parse_movie_id
+from .leaderboards import BEST_ROI, TOP_RATED, genre_board, leaderboard_movies
+from .metrics import PrometheusRenderer, registry
+from .representations import movie_values, represent_movies
+from .search import fts_available, matching_movies, ranked_page
+from .similarity import get_similarity_index
+from .snapshot import get_snapshot
+from .streaming import NDJSONRenderer, requested_stream_format, stream_movies
 from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
-from django.db.models import F, ExpressionWrapper, FloatField
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.settings import api_settings
 
 # API view for fetching details of a single movie.
 class MovieDetailView(APIView):
+    @cache_response
     def get(self, request, id):
-        # Attempt to fetch a movie by tmdb_id, then by imdb_id if not found.
+        # Skip the database for IDs recently found not to exist.
+        if is_known_missing(id):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        # IMDb IDs ('tt...') are matched on the IMDb foreign key, anything else on tmdb_id.
+        if isinstance(id, str) and id.startswith('tt'):
+            lookup = {'imdb_id': id}
+        else:
+            lookup = {'tmdb_id': id}
+        movies = represent_movies(movie_values(Movies.objects.filter(**lookup))[:1])
+        if not movies:
+            # Remember the miss and return 404 response if movie is not found.
+            remember_missing(id)
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        # Build the read-only representation of the movie.
+        return Response(movies[0])
+
+# API view resolving many movies in one request: ?ids=603,tt0133093,... (TMDB or
+# IMDb IDs, comma-separated or repeated, at most TMDB_BATCH_MAX_IDS). Results
+# follow the request order, with found=false for IDs that match no movie.
+class MovieBatchView(APIView):
+    @cache_response
+    def get(self, request):
+        values = [value.strip() for param in request.query_params.getlist('ids') for value in param.split(',')]
+        values = [value for value in values if value]
+        max_ids = getattr(settings, 'TMDB_BATCH_MAX_IDS', 500)
+        if not values:
+            return Response({'detail': 'Provide movie IDs in the ids parameter.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(values) > max_ids:
+            return Response({'detail': f'At most {max_ids} movie IDs can be requested at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        ids = [parse_movie_id(value) for value in values]
+        invalid = [value for value, movie_id in zip(values, ids) if movie_id is None]
+        if invalid:
+            return Response({'detail': f'Invalid movie IDs: {", ".join(invalid)}.'}, status=status.HTTP_400_BAD_REQUEST)
+        # One IN query per kind of ID, then one query per relation for all found movies.
+        imdb_ids = {movie_id for movie_id in ids if isinstance(movie_id, str)}
+        tmdb_ids = {movie_id for movie_id in ids if isinstance(movie_id, int)}
+        rows = {}
+        for lookup, keys in (('imdb_id__in', imdb_ids), ('tmdb_id__in', tmdb_ids)):
+            if keys:
+                rows.update((row['tmdb_id'], row) for row in movie_values(Movies.objects.filter(**{lookup: keys})))
+        movies = represent_movies(rows.values())
+        by_id = {movie['tmdb_id']: movie for movie in movies}
+        by_id.update((movie['imdb_id'], movie) for movie in movies)
+        results = []
+        for movie_id in ids:
+            movie = by_id.get(movie_id)
+            results.append({'id': movie_id, 'found': movie is not None, 'movie': movie})
+        return Response({'results': results})
+
+# API view for the movies most similar to one movie: /movies/603/similar/?k=10 (at
+# most TMDB_SIMILAR_MAX_RESULTS), scored on shared genres, casts and directors and
+# on vote proximity by the in-memory similarity index.
+class SimilarMoviesView(APIView):
+    @cache_response
+    def get(self, request, id):
+        max_results = getattr(settings, 'TMDB_SIMILAR_MAX_RESULTS', 100)
         try:
-            movie = Movies.objects.get(tmdb_id=id)
-        except Movies.DoesNotExist:
-            try:
-                movie = Movies.objects.get(imdb_id__imdb_id=id)
-            except Movies.DoesNotExist:
-                # Return 404 response if movie is not found.
-                return Response(status=status.HTTP_404_NOT_FOUND)
-        # Serialize the movie data.
-        serializer = MovieSerializer(movie)
-        return Response(serializer.data)
-    
+            k = int(request.query_params.get('k', 10))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= max_results:
+            return Response({'detail': f'k must be a number from 1 to {max_results}.'}, status=status.HTTP_400_BAD_REQUEST)
+        tmdb_ids = get_similarity_index().similar(id, k)
+        if tmdb_ids is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        positions = {tmdb_id: position for position, tmdb_id in enumerate(tmdb_ids)}
+        rows = sorted(movie_values(Movies.objects.filter(tmdb_id__in=tmdb_ids)), key=lambda row: positions[row['tmdb_id']])
+        return Response(represent_movies(rows, start_rank=1))
+
 class MovieCreateView(generics.CreateAPIView):
     queryset = Movies.objects.all()
     serializer_class = MovieSerializer
 
+# API view creating many movies from a JSON array (at most TMDB_BULK_CREATE_MAX_MOVIES)
+# in one transaction. Unknown genres, casts, directors and IMDb IDs are created.
+class MovieBulkCreateView(APIView):
+    def post(self, request):
+        max_movies = getattr(settings, 'TMDB_BULK_CREATE_MAX_MOVIES', 1000)
+        if isinstance(request.data, list) and len(request.data) > max_movies:
+            return Response({'detail': f'At most {max_movies} movies can be created at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = MovieBulkSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        tmdb_ids = [movie.tmdb_id for movie in serializer.save()]
+        # Respond with the created movies as the read endpoints represent them, in request order.
+        positions = {tmdb_id: position for position, tmdb_id in enumerate(tmdb_ids)}
+        rows = sorted(movie_values(Movies.objects.filter(tmdb_id__in=tmdb_ids)), key=lambda row: positions[row['tmdb_id']])
+        return Response(represent_movies(rows), status=status.HTTP_201_CREATED)
+
+# Base view for movie listings: cursor-paginated by vote average and ranked
+# continuously across pages.
+class RankedMovieListView(ListAPIView):
+    serializer_class = MovieSerializer
+    # Keyset order of the listing, served by the movies_vote_avg_idx index.
+    keyset_ordering = ('-vote_average', 'tmdb_id')
+
+    # Positions of the listing in the in-memory catalog snapshot, or None to query the database.
+    def snapshot_listing(self, snapshot):
+        return None
+
+    # Represent the current page, ranking it from its position in the full listing.
+    # With the catalog snapshot enabled, the page is answered from memory.
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        snapshot = get_snapshot()
+        listing = self.snapshot_listing(snapshot) if snapshot is not None else None
+        if listing is not None:
+            key = snapshot.keyset(listing, self.keyset_ordering)
+            page = self.paginator.paginate_sequence(len(listing), key, request, self)
+            movies = snapshot.represent((listing[index] for index in page), start_rank=self.paginator.start_rank)
+            return self.get_paginated_response(movies)
+        keyset_fields = (field.lstrip('-') for field in self.keyset_ordering)
+        queryset = movie_values(self.filter_queryset(self.get_queryset()), *keyset_fields)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(represent_movies(page, start_rank=self.paginator.start_rank))
+
 # API view for fetching movies by a specific actor.
-class MoviesByActorView(APIView):
-    def get(self, request, actor_name):
-        actor_name_formatted = ' '.join(word.capitalize() for word in actor_name.split('_'))
-        movies = Movies.objects.filter(casts__name=actor_name_formatted).order_by('-vote_average')
-        movies_list = list(movies)
-        serializer = MovieSerializer(movies_list, many=True, context={'movies_list': movies_list})
-        return Response(serializer.data)
+class MoviesByActorView(RankedMovieListView):
+    def get_queryset(self):
+        # Look the actor up by the indexed, normalized name.
+        return Movies.objects.filter(casts__slug=name_slug(self.kwargs['actor_name']))
+
+    def snapshot_listing(self, snapshot):
+        return snapshot.listing('casts', name_slug(self.kwargs['actor_name']))
 
 # API view for fetching movies by a specific genre.
-class MoviesByGenreView(ListAPIView):
-    serializer_class = MovieSerializer
+class MoviesByGenreView(RankedMovieListView):
+    # Pages walk the genre's precomputed leaderboard by stored rank.
+    keyset_ordering = ('rank',)
+
+    def get_queryset(self):
+        # Normalize the genre name into its indexed slug form.
+        return leaderboard_movies(genre_board(name_slug(self.kwargs['genre_name'])))
+
+    def snapshot_listing(self, snapshot):
+        return snapshot.listing('genres', name_slug(self.kwargs['genre_name']))
 
-    # Method to get a queryset of movies filtered by a specific genre.
+# API view for fetching movies directed by a specific director.
+class MoviesByDirectorView(RankedMovieListView):
     def get_queryset(self):
-        # Replace underscores with spaces in the genre name and capitalize it.
-        genre_name = self.kwargs['genre_name'].replace("_", " ").title()
-        # Return a queryset of movies that match the genre, ordered by vote average.
-        return Movies.objects.filter(genres__name__iexact=genre_name).order_by('-vote_average')
-    
-    # Overriding the list method to implement custom pagination and indexing.
+        # Query related movies directly based on the director's normalized name
+        return Movies.objects.filter(directors__slug=name_slug(self.kwargs['director_name']))
+
+    def snapshot_listing(self, snapshot):
+        return snapshot.listing('directors', name_slug(self.kwargs['director_name']))
+
+# API view combining the listing filters: /movies/search/?genre=action&actor=tom_hanks&year_from=2000
+# &min_votes=500&sort=-roi. Results are keyset-paginated and ranked like the other listings.
+# With q, titles and overviews are searched in full text (/movies/search/?q=star wa*), and
+# unless a sort is given, results are ordered by BM25 relevance.
+class MovieSearchView(RankedMovieListView):
+    # Keyset order of relevance-ranked results: BM25 score (lower is better), then TMDB ID.
+    relevance_ordering = ('relevance', 'tmdb_id')
+
     def list(self, request, *args, **kwargs):
-        # Filter the queryset based on the view's filtering
-        queryset = self.filter_queryset(self.get_queryset())
-        # Paginate the filtered queryset.
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            # Serialize the page of results.
-            serializer = self.get_serializer(page, many=True)
-            # Retrieve the current page number from the request query parameters.
-            page_number = request.query_params.get(self.paginator.page_query_param, 1)
+        # Query parameters are validated as a plain dict, so omitted booleans stay unset.
+        self.search = MovieSearchSerializer(data=request.query_params.dict())
+        self.search.is_valid(raise_exception=True)
+        if 'q' in self.search.validated_data and 'sort' not in request.query_params and fts_available():
+            self.keyset_ordering = self.relevance_ordering
+            return self.relevance_list(request)
+        # Sort by the chosen field, ties broken by TMDB ID in the same direction as the index.
+        self.keyset_ordering = (self.search.validated_data['sort'], 'tmdb_id')
+        return super().list(request, *args, **kwargs)
+
+    # One page of the full-text matches, ranked and keyset-paginated on their
+    # (score, tmdb_id) pairs by the match query itself.
+    @cache_response
+    def relevance_list(self, request):
+        params = self.search.validated_data
+        position = self.paginator.start_page(request, self)
+        if position is not None:
             try:
-                # Convert page_number to an integer.
-                page_number = int(page_number)
-            except ValueError:
-                # Default to the first page if conversion fails.
-                page_number = 1
-            # Calculate the start index for indexing movies on this page.
-            start_index = 1 + (page_number - 1) * self.paginator.page_size
-            # Add an index to each movie in the serialized data.
-            for index, movie_data in enumerate(serializer.data, start=start_index):
-                movie_data['index'] = index
-            # Return the paginated response.
-            return self.get_paginated_response(serializer.data)
-        # Serialize the full queryset if pagination is not applied.
-        serializer = self.get_serializer(queryset, many=True)
-        # Add an index starting from 1 for non-paginated data.
-        for index, movie_data in enumerate(serializer.data, start=1): 
-            movie_data['index'] = index
-        # Return the serialized data as a response.
-        return Response(serializer.data)
+                position = (float(position[0]), int(position[1]))
+            except (TypeError, ValueError):
+                raise NotFound(self.paginator.invalid_cursor_message)
+        # Other filters are applied within the match query.
+        movies = self.filter_movies(Movies.objects.all()) if set(params) - {'q', 'sort'} else None
+        matches = ranked_page(params['q'], self.paginator.limit + 1, movies, position)
+        page = self.paginator.finish_page(matches, lambda match: [match[1], match[0]])
+        positions = {tmdb_id: position for position, (tmdb_id, _) in enumerate(page)}
+        rows = sorted(movie_values(Movies.objects.filter(tmdb_id__in=positions)), key=lambda row: positions[row['tmdb_id']])
+        return self.get_paginated_response(represent_movies(rows, start_rank=self.paginator.start_rank))
+
+    def get_queryset(self):
+        movies = Movies.objects.all()
+        if 'q' in self.search.validated_data:
+            movies = matching_movies(movies, self.search.validated_data['q'])
+        return self.filter_movies(movies)
+
+    # Movies passing the search filters other than the search text.
+    def filter_movies(self, movies):
+        params = self.search.validated_data
+        # Each relation filter is its own join, so all of them must match.
+        for param, lookup in (('genre', 'genres__slug'), ('actor', 'casts__slug'), ('director', 'directors__slug')):
+            if param in params:
+                movies = movies.filter(**{lookup: name_slug(params[param])})
+        # Year bounds become date ranges, which the release date index can serve.
+        if params.get('year_from') is not None:
+            movies = movies.filter(release_date__gte=datetime.date(params['year_from'], 1, 1))
+        if params.get('year_to') is not None:
+            movies = movies.filter(release_date__lt=datetime.date(params['year_to'] + 1, 1, 1))
+        if params.get('runtime_min') is not None:
+            movies = movies.filter(runtime__gte=params['runtime_min'])
+        if params.get('runtime_max') is not None:
+            movies = movies.filter(runtime__lte=params['runtime_max'])
+        if params.get('min_votes') is not None:
+            movies = movies.filter(vote_count__gte=params['min_votes'])
+        if 'adult' in params:
+            # Compared as a value: a bare False renders as NOT adult, which the adult indexes can't serve.
+            movies = movies.filter(adult=Value(params['adult']))
+        return movies
 
-# API view for fetching movies directed by a specific director.
-class MoviesByDirectorView(APIView):
-    def get(self, request, director_name):
-        # Replace underscores and make sure queries are case-insensitive        
-        director_name = director_name.replace("_", " ").title()
-        # Query related movies directly based on the director's name
-        movies = Movies.objects.filter(directors__name__iexact=director_name).order_by('-vote_average')
-        # Serialize the movie data.
-        serializer = MovieSerializer(movies, many=True)
-        return Response(serializer.data)
-    
 # API view for fetching top-rated movies.
 class TopRatedMoviesView(APIView):
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    @cache_response
     def get(self, request, top_n):
-        movies = Movies.objects.order_by('-vote_average')[:int(top_n)]
-        movies_list = list(movies)
-        serializer = MovieSerializer(movies_list, many=True, context={'movies_list': movies_list})
-        return Response(serializer.data)
+        # Read the first N entries of the precomputed top-rated leaderboard.
+        movies = leaderboard_movies(TOP_RATED, int(top_n))
+        # Large or explicitly requested results are streamed instead of built in memory.
+        stream_format = requested_stream_format(request, int(top_n))
+        if stream_format:
+            return stream_movies(movies, stream_format)
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return Response(snapshot.represent(snapshot.top(TOP_RATED, int(top_n)), start_rank=1))
+        return Response(represent_movies(movie_values(movies), start_rank=1))
 
 # API view for fetching movies with the best Return on Investment (ROI).
 class BestROIView(APIView):
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    @cache_response
     def get(self, request, top_n):
-        # Annotate movies with ROI calculation and fetch top N movies by ROI.
-        movies = Movies.objects.annotate(
-            roi=ExpressionWrapper(F('revenue') / F('budget'), output_field=FloatField())
-        ).order_by('-roi')[:int(top_n)]
-        movies_list = list(movies)
-        serializer = MovieSerializer(movies_list, many=True, context={'movies_list': movies_list})
-        return Response(serializer.data)
+        # Read the first N entries of the precomputed best-ROI leaderboard.
+        movies = leaderboard_movies(BEST_ROI, int(top_n))
+        # Large or explicitly requested results are streamed instead of built in memory.
+        stream_format = requested_stream_format(request, int(top_n))
+        if stream_format:
+            return stream_movies(movies, stream_format)
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return Response(snapshot.represent(snapshot.top(BEST_ROI, int(top_n)), start_rank=1))
+        return Response(represent_movies(movie_values(movies), start_rank=1))
+
+# API view streaming the full catalog ordered by TMDB ID, as NDJSON by default.
+class MovieExportView(APIView):
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def get(self, request):
+        stream_format = requested_stream_format(request) or 'ndjson'
+        return stream_movies(Movies.objects.order_by('tmdb_id'), stream_format)
+
+# API view exposing the response cache hit/miss counters of this process.
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+# API view exposing this process's request timing histograms in the Prometheus
+# text format. Open to scrapers without credentials; it carries no movie data.
+class MetricsView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')